@@ -34,9 +34,11 @@ setup(
     keywords=['gis'],
     install_requires=[],
     extras_require={
+        'zstd': ['zstandard>=0.15'],
         'tests': [
             'pylint-quotes==0.2.*',
             'pylint==2.5.*',
+            'pytest-benchmark==3.2.*',
             'pytest-cov==2.9.*',
             'pytest-instafail==0.4.*',
             'pytest-isort==1.0.*',
@@ -16,5 +16,45 @@ AGOL_METATABLE = ''
 HFS_CREDITS_PER_MB = 0.24
 DOLLARS_PER_CREDIT = 0.1
 
+#: Tile layers, scene layers, notebooks, and uploaded files are billed as file storage (1.2 credits per GB)
+FILE_STORAGE_CREDITS_PER_MB = 1.2 / 1024
+
+#: Monthly credits per MB of storage for each item type. The AGOL usage report inventories and costs the items of
+#: every type listed here.
+ITEM_TYPE_CREDITS_PER_MB = {
+    'Feature Service': HFS_CREDITS_PER_MB,
+    'Map Service': FILE_STORAGE_CREDITS_PER_MB,
+    'Vector Tile Service': FILE_STORAGE_CREDITS_PER_MB,
+    'Scene Service': FILE_STORAGE_CREDITS_PER_MB,
+    'Notebook': FILE_STORAGE_CREDITS_PER_MB,
+}
+
 #: e.g. r'C:\temp'
 REPORT_DIR = ''
+#: Compress reports as they're written: None, 'gzip', or 'zstd' (requires 'pip install reporter[zstd]')
+REPORT_COMPRESSION = None
+#: None for the default level (6 for gzip, 3 for zstd)
+REPORT_COMPRESSION_LEVEL = None
+#: Flush reports all the way to disk before they're moved into place
+REPORT_FSYNC = False
+
+#: Optional limit on how long the AGOL usage report spends getting item info. The most expensive items are done first;
+#: any left over reuse their sharing and usage info from the last run and are marked as stale. None for no limit.
+AGOL_TIME_BUDGET_MINUTES = None
+
+#: All AGOL requests share one pool of kept-alive connections. Match the pool size to the number of threads making
+#: AGOL requests at once. Timeout is (connect, read) in seconds.
+AGOL_HTTP_POOL_SIZE = 10
+AGOL_HTTP_TIMEOUT = (10, 120)
+
+#: How long the org's group catalog is cached between runs before all the groups are searched again. Keep this a few
+#: hours shorter than the time between scheduled runs so that whether a run refreshes it doesn't come down to seconds.
+GROUP_CACHE_HOURS = 20
+
+#: Cron-style schedules ('minute hour day_of_month month day_of_week') on which 'reporter daemon' runs the reports
+DAEMON_SCHEDULES = ['0 2 * * *']
+#: How often the daemon logs back in to AGOL. Keep this below the 60 minute lifetime of the arcpy.SignInToPortal and
+#: GIS tokens so the lookups are never re-read with an expired token.
+DAEMON_SESSION_MINUTES = 45
+#: How long the daemon reuses the Open Data groups and metatables before reading them again
+DAEMON_CACHE_MINUTES = 12 * 60
@@ -0,0 +1,149 @@
+"""
+Long-running scheduler for 'reporter daemon'.
+
+Instead of paying for interpreter startup, imports, and an AGOL login on every scheduled task, the daemon keeps a
+single tools.AGOLSession alive and runs the reports whenever one of its cron-style schedules comes due. Between runs it
+refreshes the session's login and cached lookups as they expire so that a scheduled run starts on the actual work.
+"""
+
+import datetime
+import time
+
+
+def _now():
+    """Wrapper for datetime.now() so that it can be Mocked out in testing."""
+    return datetime.datetime.now()
+
+
+class CronSchedule:  # pylint: disable=too-many-instance-attributes
+    """
+    A standard five-field cron expression: 'minute hour day_of_month month day_of_week'.
+
+    Each field can be '*', a number, a range ('1-5'), a step ('*/15', '0-30/10'), or a comma-separated list of any of
+    those. Day of week runs from 0 (Sunday) to 6 (Saturday); 7 is also accepted for Sunday. As with cron, if both day
+    of month and day of week are restricted, a day matching either one matches.
+    """
+
+    #: (min, max) for each field
+    field_ranges = ((0, 59), (0, 23), (1, 31), (1, 12), (0, 7))
+
+    def __init__(self, expression):
+        self.expression = expression
+        fields = expression.split()
+        if len(fields) != 5:
+            raise ValueError(f'Cron expression "{expression}" must have five fields')
+
+        self.minutes, self.hours, self.days, self.months, days_of_week = [
+            self._parse_field(field, low, high) for field, (low, high) in zip(fields, self.field_ranges)
+        ]
+        self.days_of_week = {day % 7 for day in days_of_week}  #: 7 and 0 are both Sunday
+        self.days_restricted = fields[2] != '*'
+        self.days_of_week_restricted = fields[4] != '*'
+
+    def __repr__(self):
+        return f'CronSchedule({self.expression!r})'
+
+    def _parse_field(self, field, low, high):
+        values = set()
+        for part in field.split(','):
+            step = 1
+            if '/' in part:
+                part, step_text = part.split('/', 1)
+                step = int(step_text)
+                if step < 1:
+                    raise ValueError(f'Invalid step in cron expression "{self.expression}"')
+
+            if part == '*':
+                start, end = low, high
+            elif '-' in part:
+                start, end = (int(value) for value in part.split('-', 1))
+            else:
+                start = end = int(part)
+
+            if start < low or end > high or start > end:
+                raise ValueError(f'"{part}" is out of range in cron expression "{self.expression}"')
+            values.update(range(start, end + 1, step))
+
+        return values
+
+    def _day_matches(self, moment):
+        day_matches = moment.day in self.days
+        day_of_week_matches = (moment.weekday() + 1) % 7 in self.days_of_week  #: python's Monday is 0, cron's is 1
+
+        if self.days_restricted and self.days_of_week_restricted:
+            return day_matches or day_of_week_matches
+        return day_matches and day_of_week_matches
+
+    def matches(self, moment):
+        """Whether the datetime moment (to the minute) is one of the scheduled times"""
+
+        return (
+            moment.minute in self.minutes and moment.hour in self.hours and moment.month in self.months and
+            self._day_matches(moment)
+        )
+
+    def next_run(self, after):
+        """
+        Returns the first scheduled datetime strictly after the datetime after, to the minute.
+        """
+
+        moment = after.replace(second=0, microsecond=0) + datetime.timedelta(minutes=1)
+        limit = moment + datetime.timedelta(days=366 * 5)  #: Enough to find Feb 29ths
+        while moment < limit:
+            if moment.month not in self.months or not self._day_matches(moment):
+                moment = (moment + datetime.timedelta(days=1)).replace(hour=0, minute=0)
+                continue
+            if moment.hour not in self.hours:
+                moment = (moment + datetime.timedelta(hours=1)).replace(minute=0)
+                continue
+            if moment.minute in self.minutes:
+                return moment
+            moment += datetime.timedelta(minutes=1)
+
+        raise ValueError(f'Cron expression "{self.expression}" never runs')
+
+
+def run_daemon(logger, schedules, session, run, poll_seconds=60):
+    """
+    Run forever (until interrupted), calling run(logger, session) each time one of the schedules comes due.
+
+    logger:         Logger for the daemon's own messages
+    schedules:      List of CronSchedule objects
+    session:        A tools.AGOLSession, refreshed while idle so it's ready when the next run starts. None if none of
+                    the reports use AGOL.
+    run:            Function that runs the reports, eg main.run_reports
+    poll_seconds:   Longest time to sleep between checks, which is also how often the session gets refreshed
+    """
+
+    if not schedules:
+        raise ValueError('The daemon needs at least one schedule')
+
+    def _next_run(after):
+        return min(schedule.next_run(after) for schedule in schedules)
+
+    logger.info('Starting reporter daemon...')
+    if session is not None:
+        logger.info('Warming up session...')
+        session.refresh()
+
+    next_run = _next_run(_now())
+    logger.info(f'Next run at {next_run}')
+
+    while True:
+        now = _now()
+        if now >= next_run:
+            try:
+                run(logger, session)
+            except Exception:
+                logger.exception('Scheduled run failed')
+            next_run = _next_run(max(now, _now()))
+            logger.info(f'Next run at {next_run}')
+            continue
+
+        if session is not None:
+            try:
+                session.refresh()
+            except Exception:
+                logger.exception('Session refresh failed, will retry')
+
+        time.sleep(max(0, min(poll_seconds, (next_run - _now()).total_seconds())))
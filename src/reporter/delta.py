@@ -0,0 +1,177 @@
+"""
+Run-to-run delta of the AGOL usage report.
+
+Each run stores a compact fingerprint of every item's row, keyed by itemid. The next run compares its rows against
+those fingerprints in a single pass (one dict lookup per item) and reports only the items that changed: new or removed
+items, size jumps, sharing changes, items that joined or left the SGID, and changes to the item's descriptive metadata
+(METADATA_COLUMNS). Views, usage counts, and the modified date change every day (the SGID services are updated
+nightly) and are deliberately left out of the comparison.
+
+The metadata hash covers a fixed set of columns rather than whatever the report's columns happen to be, so adding a
+column to the report doesn't flag every item as changed. If METADATA_COLUMNS itself changes, the saved fingerprints
+are discarded and the next run starts a fresh baseline.
+"""
+
+import hashlib
+import json
+import os
+
+#: The fingerprints from the latest run live alongside the AGOL usage csvs
+FINGERPRINT_FILENAME = 'AGOLUsage_fingerprints.json'
+
+#: Columns whose changes are reported as a sharing change
+SHARING_COLUMNS = ('sharing_everyone', 'sharing_org', 'sharing_groups', 'open_data_group')
+
+#: Columns whose changes are reported as a metadata change
+METADATA_COLUMNS = ('title', 'type', 'owner', 'folder', 'authoritative', 'tags')
+
+#: The columns of the delta report, in output order
+DELTA_COLUMNS = ('itemid', 'title', 'changes', 'previous_sizeMB', 'sizeMB', 'in_sgid')
+
+#: Change types, in the order they're listed in the delta report and summary
+CHANGE_TYPES = ('new', 'removed', 'size', 'sharing', 'joined_sgid', 'left_sgid', 'metadata')
+
+
+def _hash(row, columns):
+    hasher = hashlib.blake2b(digest_size=16)
+    for column in columns:
+        hasher.update(str(row.get(column)).encode('utf-8'))
+        hasher.update(b'\x1f')  #: Unit separator so that ('ab', 'c') and ('a', 'bc') don't collide
+
+    return hasher.hexdigest()
+
+
+def _to_float(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def item_fingerprints(rows):
+    """
+    Build the fingerprints for a run's rows. Rows whose sharing isn't known (eg, stale rows with no history) get a
+    sharing hash of None, which compare() doesn't treat as a sharing change in either direction.
+
+    rows:       Iterable of tools.ItemInfoRow objects or dicts with the same keys
+
+    Returns a dict of {itemid: [metadata_hash, sharing_hash, title, sizeMB, in_sgid]}
+    """
+
+    fingerprints = {}
+    for row in rows:
+        sharing_known = any(row.get(column) is not None for column in SHARING_COLUMNS)
+        fingerprints[row['itemid']] = [
+            _hash(row, METADATA_COLUMNS),
+            _hash(row, SHARING_COLUMNS) if sharing_known else None,
+            row.get('title'),
+            _to_float(row.get('sizeMB')),
+            row.get('in_sgid'),
+        ]
+
+    return fingerprints
+
+
+def load_fingerprints(path):
+    """
+    Returns the fingerprints saved at path, or None if there aren't any (ie, the first run) or they were hashed from
+    different metadata columns than METADATA_COLUMNS.
+    """
+
+    if not path.exists():
+        return None
+
+    with open(path, 'r', encoding='utf-8') as fingerprint_file:
+        saved = json.load(fingerprint_file)
+
+    if saved.get('metadata_columns') != list(METADATA_COLUMNS):
+        return None
+    return saved['items']
+
+
+def save_fingerprints(fingerprints, path):
+    """
+    Saves fingerprints to path, replacing the previous run's fingerprints only once the new ones are fully written.
+    """
+
+    path.parent.mkdir(parents=True, exist_ok=True)
+    temp_path = path.with_name(path.name + '.tmp')
+    saved = {'metadata_columns': METADATA_COLUMNS, 'items': fingerprints}
+    with open(temp_path, 'w', encoding='utf-8') as fingerprint_file:
+        json.dump(saved, fingerprint_file, separators=(',', ':'))
+    os.replace(temp_path, path)
+
+
+def _size_changed(previous_size, current_size, size_threshold):
+    if previous_size is None or current_size is None:
+        return previous_size != current_size
+    if previous_size == 0:
+        return current_size != 0
+
+    return abs(current_size - previous_size) / previous_size > size_threshold
+
+
+def _changes(previous_fingerprint, fingerprint, size_threshold):
+    """
+    Returns the list of change types (in CHANGE_TYPES order) between two fingerprints of the same item.
+    """
+
+    changes = []
+    if _size_changed(previous_fingerprint[3], fingerprint[3], size_threshold):
+        changes.append('size')
+    if None not in (fingerprint[1], previous_fingerprint[1]) and fingerprint[1] != previous_fingerprint[1]:
+        changes.append('sharing')
+    if fingerprint[4] != previous_fingerprint[4]:
+        changes.append('joined_sgid' if fingerprint[4] == 'True' else 'left_sgid')
+    if fingerprint[0] != previous_fingerprint[0]:
+        changes.append('metadata')
+
+    return changes
+
+
+def compare(previous, current, size_threshold=0.1):
+    """
+    Compare the current run's fingerprints against the previous run's.
+
+    previous:       Fingerprints from the previous run (see item_fingerprints())
+    current:        Fingerprints from this run
+    size_threshold: Relative change in sizeMB that counts as a size jump. Defaults to 10%.
+
+    Returns (delta_rows, summary): a list of dicts with DELTA_COLUMNS keys for every changed item, and a dict of
+    {change_type: count} for every type in CHANGE_TYPES.
+    """
+
+    delta_rows = []
+    summary = dict.fromkeys(CHANGE_TYPES, 0)
+
+    def _add(itemid, fingerprint, changes, previous_size):
+        for change in changes:
+            summary[change] += 1
+        delta_rows.append({
+            'itemid': itemid,
+            'title': fingerprint[2],
+            'changes': ', '.join(changes),
+            'previous_sizeMB': previous_size,
+            'sizeMB': fingerprint[3],
+            'in_sgid': fingerprint[4],
+        })
+
+    for itemid, fingerprint in current.items():
+        previous_fingerprint = previous.get(itemid)
+        if previous_fingerprint is None:
+            _add(itemid, fingerprint, ['new'], None)
+            continue
+
+        if fingerprint == previous_fingerprint:
+            continue
+
+        changes = _changes(previous_fingerprint, fingerprint, size_threshold)
+        if changes:
+            _add(itemid, fingerprint, changes, previous_fingerprint[3])
+
+    for itemid, previous_fingerprint in previous.items():
+        if itemid not in current:
+            removed_fingerprint = previous_fingerprint[:3] + [None, previous_fingerprint[4]]
+            _add(itemid, removed_fingerprint, ['removed'], previous_fingerprint[3])
+
+    return delta_rows, summary
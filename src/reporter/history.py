@@ -0,0 +1,187 @@
+"""
+A local, indexed history of every AGOL usage report run so that trend questions don't require re-parsing old csvs.
+
+Each run's rows are appended to a SQLite table keyed by (itemid, run_date), indexed on both itemid and run_date for
+per-item queries. The org-wide totals for each run are calculated once when the run is appended and kept in a separate
+one-row-per-run summary table, so org-wide trend queries never have to aggregate the item rows.
+"""
+
+import sqlite3
+from pathlib import Path
+
+from . import tools
+
+#: The history database lives alongside the AGOL usage csvs
+HISTORY_FILENAME = 'AGOLUsage_history.sqlite3'
+
+#: Columns pulled out for per-item trend queries, in output order
+ITEM_TREND_COLUMNS = ('run_date', 'title', 'sizeMB', 'monthly_credits', 'monthly_cost', 'views', 'data_requests_1Y')
+
+#: Aggregates calculated for each run in org-wide trend queries, in output order
+ORG_TREND_COLUMNS = ('run_date', 'items', 'sizeMB', 'monthly_credits', 'monthly_cost', 'data_requests_1Y')
+
+
+class ReportHistory:
+    """
+    A SQLite store of AGOL usage report rows across runs.
+
+    db_path:    Path object to the SQLite database. Created (along with its parent directory) if it doesn't exist.
+    """
+
+    def __init__(self, db_path):
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self.connection = sqlite3.connect(str(self.db_path))
+        self._create_schema()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def close(self):
+        """Close the underlying database connection"""
+        self.connection.close()
+
+    def _create_schema(self):
+        columns = ', '.join(f'"{column}"' for column in tools.ITEM_INFO_COLUMNS if column != 'itemid')
+        summary_exists = self.connection.execute(
+            'SELECT 1 FROM sqlite_master WHERE type = \'table\' AND name = \'run_summary\''
+        ).fetchone()
+        with self.connection:
+            self.connection.execute(
+                f'CREATE TABLE IF NOT EXISTS item_history '
+                f'(run_date TEXT NOT NULL, itemid TEXT NOT NULL, {columns}, PRIMARY KEY (itemid, run_date)) '
+                f'WITHOUT ROWID'
+            )
+            self.connection.execute('CREATE INDEX IF NOT EXISTS item_history_run_date ON item_history (run_date)')
+
+            #: Add any report columns that have been added since the database was created
+            existing_columns = {row[1] for row in self.connection.execute('PRAGMA table_info(item_history)')}
+            for column in tools.ITEM_INFO_COLUMNS:
+                if column not in existing_columns:
+                    self.connection.execute(f'ALTER TABLE item_history ADD COLUMN "{column}"')
+
+            self.connection.execute(
+                'CREATE TABLE IF NOT EXISTS run_summary '
+                '(run_date TEXT PRIMARY KEY, items INTEGER, sizeMB REAL, credits REAL, cost REAL, requests INTEGER)'
+            )
+            #: Databases from before the summary table existed get summaries for all their runs, once
+            if not summary_exists:
+                self._summarize_runs()
+
+    def _summarize_runs(self, run_date=None):
+        #: (Re)calculate the org-wide totals for run_date, or for every run if run_date is None
+        query = (
+            'INSERT OR REPLACE INTO run_summary (run_date, items, sizeMB, credits, cost, requests) '
+            'SELECT run_date, COUNT(*), SUM(sizeMB), SUM(monthly_credits), SUM(monthly_cost), '
+            'SUM(CASE WHEN typeof(data_requests_1Y) = \'integer\' THEN data_requests_1Y END) '
+            'FROM item_history'
+        )
+        parameters = []
+        if run_date is not None:
+            query += ' WHERE run_date = ?'
+            parameters.append(run_date)
+        query += ' GROUP BY run_date'
+
+        self.connection.execute(query, parameters)
+
+    def append_run(self, run_date, rows):
+        """
+        Store all of a run's rows under run_date and update the run's org-wide summary. Re-appending the same run_date
+        replaces that run's rows for any itemids that are repeated.
+
+        run_date:   String representing the run, in a sortable format (eg, '2020-12-25 18:30:55')
+        rows:       Iterable of tools.ItemInfoRow objects or dicts with the same keys
+        """
+
+        columns = ('run_date',) + tools.ITEM_INFO_COLUMNS
+        column_names = ', '.join(f'"{column}"' for column in columns)
+        placeholders = ', '.join('?' * len(columns))
+        with self.connection:
+            self.connection.executemany(
+                f'INSERT OR REPLACE INTO item_history ({column_names}) VALUES ({placeholders})',
+                ([run_date] + [row.get(column) for column in tools.ITEM_INFO_COLUMNS] for row in rows),
+            )
+            self._summarize_runs(run_date)
+
+    def latest_rows(self, itemids):
+        """
+        Returns the most recent stored row for each of itemids as a dict of {itemid: {column: value, ...}}. Items that
+        aren't in the history are left out.
+        """
+
+        itemids = list(itemids)
+        column_names = ', '.join(f'history."{column}"' for column in tools.ITEM_INFO_COLUMNS)
+        latest_rows = {}
+
+        #: Stay well under SQLite's limit on the number of query parameters
+        chunk_size = 500
+        for start in range(0, len(itemids), chunk_size):
+            chunk = itemids[start:start + chunk_size]
+            placeholders = ', '.join('?' * len(chunk))
+            cursor = self.connection.execute(
+                f'SELECT {column_names} FROM item_history AS history '
+                f'JOIN (SELECT itemid, MAX(run_date) AS run_date FROM item_history '
+                f'WHERE itemid IN ({placeholders}) GROUP BY itemid) AS latest '
+                f'ON history.itemid = latest.itemid AND history.run_date = latest.run_date',
+                chunk,
+            )
+            for row in cursor:
+                latest_rows[row[0]] = dict(zip(tools.ITEM_INFO_COLUMNS, row))
+
+        return latest_rows
+
+    def run_dates(self):
+        """Returns a list of all the stored run dates, oldest first"""
+
+        cursor = self.connection.execute('SELECT run_date FROM run_summary ORDER BY run_date')
+        return [run_date for run_date, in cursor]
+
+    def item_trend(self, itemid, since=None):
+        """
+        Returns a list of tuples (see ITEM_TREND_COLUMNS) for a single item, one per run, oldest first.
+
+        itemid:     The AGOL item id
+        since:      Optional run_date string; only runs on or after this date are returned
+        """
+
+        column_names = ', '.join(f'"{column}"' for column in ITEM_TREND_COLUMNS)
+        query = f'SELECT {column_names} FROM item_history WHERE itemid = ?'
+        parameters = [itemid]
+        if since:
+            query += ' AND run_date >= ?'
+            parameters.append(since)
+        query += ' ORDER BY run_date'
+
+        return self.connection.execute(query, parameters).fetchall()
+
+    def org_trend(self, since=None):
+        """
+        Returns a list of tuples (see ORG_TREND_COLUMNS) with org-wide totals, one per run, oldest first. Read from
+        the per-run summary table rather than aggregated from the item rows.
+
+        since:      Optional run_date string; only runs on or after this date are returned
+        """
+
+        query = 'SELECT run_date, items, sizeMB, credits, cost, requests FROM run_summary'
+        parameters = []
+        if since:
+            query += ' WHERE run_date >= ?'
+            parameters.append(since)
+        query += ' ORDER BY run_date'
+
+        return self.connection.execute(query, parameters).fetchall()
+
+
+def format_table(columns, rows, separator='|'):
+    """
+    Returns a list of separator-delimited lines, starting with a header, suitable for printing to the console.
+    """
+
+    lines = [separator.join(columns)]
+    for row in rows:
+        lines.append(separator.join('' if value is None else str(value) for value in row))
+
+    return lines
@@ -1,15 +1,19 @@
 #!/usr/bin/env python
 # * coding: utf8 *
 """
-Main entry point for Reporter. Can contain both CLI and (future) scheduled entry points.
+Main entry point for Reporter. Contains both the one-off CLI entry point and the long-running scheduled daemon.
 """
 
+import argparse
 import datetime
+import functools
 import logging
+import logging.handlers
+import queue
 import sys
 from pathlib import Path
 
-from . import reports
+from . import daemon, history, registry
 
 try:
     from . import credentials
@@ -17,27 +21,138 @@ except (ModuleNotFoundError, ImportError):
     from . import credentials_template as credentials
 
 
-def run_reports(logger):
+def load_reports(names=None):
+    """
+    Returns the Report classes registered under names (all of the available reports if None), importing only those
+    reports and their dependencies. Raises a KeyError for unknown names before anything is run.
+    """
+
+    available_reports = registry.available_reports()
+    if not names:
+        names = list(available_reports)
+
+    return [registry.load_report(name, available_reports) for name in names]
+
+
+def run_reports(logger, session=None, names=None):
     """
     Main logic for instantiating report objects and running their methods.
+
+    session:    Optional tools.AGOLSession shared by the AGOL reports. Each report logs in on its own if None.
+    names:      Optional list of registered report names to run. Runs all of them if None.
     """
 
-    now = datetime.datetime.today().strftime('%Y%m%d-%H%M%S')
-    agol_out_path = Path(credentials.REPORT_DIR, 'AGOLUsage', f'AGOLReport_{now}.csv')
+    now = datetime.datetime.today()
 
     reports_to_run = []
-    reports_to_run.append(reports.AGOLUsageReport(logger, agol_out_path))
+    for report_class in load_reports(names):
+        report_session = session if report_class.uses_agol_session else None
+        reports_to_run.append(report_class.from_credentials(logger, now, report_session))
 
     for report in reports_to_run:
         data = report.create_report()
         report.save_report(data)
 
 
-def main():
+def query_history(args):
     """
-    CLI entry point; sets up logger.
+    Prints per-item or org-wide trends from the report history database to stdout.
     """
 
+    history_path = Path(credentials.REPORT_DIR, 'AGOLUsage', history.HISTORY_FILENAME)
+    if not history_path.exists():
+        print(f'No report history found at {history_path}', file=sys.stderr)
+        return 1
+
+    with history.ReportHistory(history_path) as report_history:
+        if args.scope == 'item':
+            lines = history.format_table(
+                history.ITEM_TREND_COLUMNS, report_history.item_trend(args.itemid, args.since)
+            )
+        else:
+            lines = history.format_table(history.ORG_TREND_COLUMNS, report_history.org_trend(args.since))
+
+    for line in lines:
+        print(line)
+
+    return 0
+
+
+def run_daemon(logger, names=None):
+    """
+    Keeps a warm AGOL session (if any of the reports need one) and runs the reports in names (all of them if None) on
+    the DAEMON_SCHEDULES cron schedules until interrupted.
+    """
+
+    from . import reports  # pylint: disable=import-outside-toplevel
+
+    schedules = [daemon.CronSchedule(expression) for expression in reports.setting('DAEMON_SCHEDULES')]
+
+    session = None
+    if any(report_class.uses_agol_session for report_class in load_reports(names)):
+        session = reports.create_agol_session(
+            logger,
+            max_session_minutes=reports.setting('DAEMON_SESSION_MINUTES'),
+            cache_minutes=reports.setting('DAEMON_CACHE_MINUTES'),
+        )
+
+    try:
+        daemon.run_daemon(logger, schedules, session, functools.partial(run_reports, names=names))
+    except KeyboardInterrupt:
+        logger.info('Stopping reporter daemon')
+
+    return 0
+
+
+def _parse_args(argv):
+    parser = argparse.ArgumentParser(prog='reporter', description='Reports AGOL usage statistics.')
+    subparsers = parser.add_subparsers(dest='command')
+
+    run_parser = subparsers.add_parser('run', help='Run reports once (the default)')
+    run_parser.add_argument('names', nargs='*', help='Names of the reports to run; all of them if none are given')
+
+    subparsers.add_parser('list', help='List the available reports')
+
+    daemon_parser = subparsers.add_parser('daemon', help='Stay running and run the reports on the configured schedules')
+    daemon_parser.add_argument('names', nargs='*', help='Names of the reports to run; all of them if none are given')
+
+    history_parser = subparsers.add_parser('history', help='Query trends from previous report runs')
+    history_subparsers = history_parser.add_subparsers(dest='scope')
+    history_subparsers.required = True
+    item_parser = history_subparsers.add_parser('item', help='Trend for a single item')
+    item_parser.add_argument('itemid', help='AGOL item id')
+    org_parser = history_subparsers.add_parser('org', help='Org-wide totals for each run')
+    for subparser in (item_parser, org_parser):
+        subparser.add_argument('--since', help='Only include runs on or after this date (eg, 2020-06-01)')
+
+    args = parser.parse_args(argv)
+
+    #: Catch typos here with a usage message rather than as a KeyError once the reports are loaded
+    names = getattr(args, 'names', None)
+    if names:
+        available_reports = registry.available_reports()
+        unknown_names = [name for name in names if name not in available_reports]
+        if unknown_names:
+            parser.error(
+                f'unknown report(s): {", ".join(unknown_names)} (available: {", ".join(sorted(available_reports))})'
+            )
+
+    return args
+
+
+def main(argv=None):
+    """
+    CLI entry point; sets up logger. With no command, runs all the reports.
+    """
+
+    args = _parse_args(argv)
+    if args.command == 'history':
+        return query_history(args)
+    if args.command == 'list':
+        for name, location in registry.available_reports().items():
+            print(f'{name}\t{location}')
+        return 0
+
     cli_logger = logging.getLogger('reporter')
     cli_logger.setLevel(logging.INFO)
     detailed_formatter = logging.Formatter(
@@ -46,11 +161,25 @@ def main():
     cli_handler = logging.StreamHandler(stream=sys.stdout)
     cli_handler.setLevel(logging.INFO)
     cli_handler.setFormatter(detailed_formatter)
-    cli_logger.addHandler(cli_handler)
 
-    run_reports(cli_logger)
+    #: Log calls just drop the record on a queue; a background listener thread does the formatting and console I/O
+    #: so that the report loops never wait on stdout.
+    log_queue = queue.Queue(-1)
+    cli_logger.addHandler(logging.handlers.QueueHandler(log_queue))
+    listener = logging.handlers.QueueListener(log_queue, cli_handler, respect_handler_level=True)
+    listener.start()
+
+    try:
+        if args.command == 'daemon':
+            return run_daemon(cli_logger, args.names)
+
+        run_reports(cli_logger, names=getattr(args, 'names', None))
+    finally:
+        listener.stop()  #: Flushes any queued records
+
+    return 0
 
 
 if __name__ == '__main__':
 
-    main()
+    sys.exit(main())
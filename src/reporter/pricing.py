@@ -0,0 +1,45 @@
+"""
+Storage cost calculations for a whole item inventory.
+
+Costs are calculated in a single columnar pass after all the items have been fetched: the sizes and per-type credit
+rates are pulled into flat double arrays and multiplied together, then the results are written back to the rows. The
+rate for each item type is looked up once per type rather than once per item, so the whole org can be re-costed with
+a different pricing table without touching AGOL.
+"""
+
+import operator
+from array import array
+
+
+def apply_pricing(rows, credits_per_mb, dollars_per_credit, default_credits_per_mb=0.0):
+    """
+    Calculate monthly_credits and monthly_cost for every row from its type and sizeMB.
+
+    rows:                   List of tools.ItemInfoRow objects or dicts with 'type' and 'sizeMB' keys. Updated in
+                            place.
+    credits_per_mb:         Dict of monthly credits charged per MB of storage for each item type, eg
+                            {'Feature Service': 0.24, 'Vector Tile Service': 0.0012}
+    dollars_per_credit:     Cost of a single credit
+    default_credits_per_mb: Rate used for item types not in credits_per_mb. Defaults to 0 (not charged).
+
+    Returns rows for convenience.
+    """
+
+    if not rows:
+        return rows
+
+    rate_by_type = {}
+    for item_type in {row['type'] for row in rows}:
+        rate_by_type[item_type] = credits_per_mb.get(item_type, default_credits_per_mb)
+
+    sizes = array('d', (row['sizeMB'] or 0.0 for row in rows))
+    rates = array('d', (rate_by_type[row['type']] for row in rows))
+
+    monthly_credits = array('d', map(operator.mul, sizes, rates))
+    monthly_costs = array('d', (row_credits * dollars_per_credit for row_credits in monthly_credits))
+
+    for row, row_credits, row_cost in zip(rows, monthly_credits, monthly_costs):
+        row['monthly_credits'] = row_credits
+        row['monthly_cost'] = row_cost
+
+    return rows
@@ -0,0 +1,73 @@
+"""
+The registry of available reports.
+
+Reports are listed by name with the 'module:ClassName' path of their Report subclass, and the module is only imported
+when the report is selected. Each Report subclass declares the (often slow to import) packages it depends on in its
+dependencies attribute; those are imported by load_report() and not before, so running a lightweight report never pays
+for the imports or AGOL login of the AGOL reports.
+
+Other packages can add reports by registering their Report subclasses under the 'reporter.reports' entry point group
+(requires Python 3.8+), eg in setup.py:
+    entry_points={'reporter.reports': ['my_report = my_package.my_module:MyReport']}
+"""
+
+import importlib
+
+#: Reports that ship with reporter: {name: 'module:ClassName'}
+BUILT_IN_REPORTS = {
+    'agol_usage': 'reporter.reports:AGOLUsageReport',
+}
+
+ENTRY_POINT_GROUP = 'reporter.reports'
+
+
+def _entry_point_reports():
+    try:
+        from importlib.metadata import entry_points  # pylint: disable=import-outside-toplevel
+    except ImportError:  #: Python < 3.8
+        return {}
+
+    all_entry_points = entry_points()
+    if hasattr(all_entry_points, 'select'):
+        group = all_entry_points.select(group=ENTRY_POINT_GROUP)
+    else:  #: Python < 3.10 returns a dict of groups
+        group = all_entry_points.get(ENTRY_POINT_GROUP, [])
+
+    return {entry_point.name: entry_point.value for entry_point in group}
+
+
+def available_reports():
+    """
+    Returns a dict of every registered report: {name: 'module:ClassName'}. Built-in reports take precedence over
+    entry points with the same name.
+    """
+
+    reports = _entry_point_reports()
+    reports.update(BUILT_IN_REPORTS)
+
+    return reports
+
+
+def load_report(name, reports=None):
+    """
+    Imports and returns the Report subclass registered as name, along with the packages it declares in its
+    dependencies attribute.
+
+    name:       The report's registered name
+    reports:    Optional {name: 'module:ClassName'} dict to look the name up in. Defaults to available_reports().
+
+    Raises a KeyError if name isn't registered.
+    """
+
+    if reports is None:
+        reports = available_reports()
+    if name not in reports:
+        raise KeyError(f'Unknown report "{name}". Available reports: {", ".join(sorted(reports))}')
+
+    module_name, class_name = reports[name].split(':')
+    report_class = getattr(importlib.import_module(module_name), class_name)
+
+    for dependency in report_class.dependencies:
+        importlib.import_module(dependency)
+
+    return report_class
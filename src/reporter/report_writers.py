@@ -1,73 +1,221 @@
 """
 A module holding different functions for writing data. Each function can accept an arbitrary data structure holding
 the data to be written.
+
+The list_of_dicts_* writers accept either dicts or dict-like rows (such as tools.ItemInfoRow) that provide keys() and
+lookup by column name.
+
+All the writers stream their output to a temporary file in the destination directory and only rename it into place
+once it has been completely written, so a crash never leaves a half-written report at the final path. They can also
+compress the output as it's written ('gzip', or 'zstd' if the zstandard package is installed) and fsync it before the
+rename.
 """
 
+import contextlib
 import csv
 import datetime
-import logging
-import logging.handlers
+import gzip
+import io
+import operator
+import os
+
+try:
+    import zstandard
+except ModuleNotFoundError:
+    zstandard = None  # pylint: disable=invalid-name
 
+#: File suffix added to the output path for each compression type
+COMPRESSION_SUFFIXES = {'gzip': '.gz', 'zstd': '.zst'}
 
-def list_of_dicts_to_csv(data, out_path):
+
+def compressed_path(out_path, compression=None):
+    """
+    Returns out_path with the suffix for compression added (eg, report.csv -> report.csv.gz).
     """
-    Writes data, a list of dicts with the same keys, to the csv file specified by out_path Path object.
+
+    if compression is None:
+        return out_path
+    if compression not in COMPRESSION_SUFFIXES:
+        raise ValueError(f'Unknown compression "{compression}", must be one of {", ".join(COMPRESSION_SUFFIXES)}')
+
+    suffix = COMPRESSION_SUFFIXES[compression]
+    if out_path.name.endswith(suffix):
+        return out_path
+    return out_path.with_name(out_path.name + suffix)
+
+
+def _compressing_stream(raw_file, compression, compression_level):
+    if compression is None:
+        return raw_file
+    if compression == 'gzip':
+        level = 6 if compression_level is None else compression_level
+        #: GzipFile would otherwise store the temporary file's name in the header, so leave the name out
+        return gzip.GzipFile(filename='', fileobj=raw_file, mode='wb', compresslevel=level)
+
+    if zstandard is None:
+        raise ValueError('zstd compression requires the zstandard package')
+    level = 3 if compression_level is None else compression_level
+    return zstandard.ZstdCompressor(level=level).stream_writer(raw_file, closefd=False)
+
+
+def _fsync_directory(directory):
+    #: Makes the rename itself durable. Directories can't be opened on Windows, where this isn't needed anyway.
+    try:
+        directory_fd = os.open(str(directory), os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(directory_fd)
+    finally:
+        os.close(directory_fd)
+
+
+@contextlib.contextmanager
+def atomic_text_writer(out_path, compression=None, compression_level=None, fsync=False):
+    """
+    Context manager yielding a text stream that writes to a temporary file next to out_path, optionally compressing
+    the data as it's written, and renames the temporary file to out_path once the block exits without an error. If
+    the block raises, the temporary file is deleted and out_path is left untouched.
+
+    out_path:           Path object to the final file. The parent directory must exist.
+    compression:        None, 'gzip', or 'zstd'. out_path is used as-is; see compressed_path() for adding a suffix.
+    compression_level:  Compression level; defaults to 6 for gzip and 3 for zstd.
+    fsync:              Flush the file (and the rename) all the way to disk before returning.
+    """
+
+    temp_path = out_path.with_name(f'.{out_path.name}.tmp')
+    raw_file = open(temp_path, 'wb')  # pylint: disable=consider-using-with
+    compressed_stream = text_stream = None
+    try:
+        compressed_stream = _compressing_stream(raw_file, compression, compression_level)
+        text_stream = io.TextIOWrapper(compressed_stream, encoding='utf-8', newline='\n', write_through=False)
+        yield text_stream
+        #: Closing the wrapper would close raw_file for uncompressed output, so flush it and detach instead
+        text_stream.flush()
+        text_stream.detach()
+        if compressed_stream is not raw_file:
+            compressed_stream.close()  #: Writes the compression trailer; leaves raw_file open
+        raw_file.flush()
+        if fsync:
+            os.fsync(raw_file.fileno())
+        raw_file.close()
+        os.replace(temp_path, out_path)
+    except BaseException:
+        #: Close the wrappers before raw_file so they aren't finalized later against a closed file. The file is being
+        #: thrown away, so errors flushing whatever they had buffered don't matter.
+        for stream in (text_stream, compressed_stream):
+            if stream is not None and stream is not raw_file:
+                with contextlib.suppress(Exception):
+                    stream.close()
+        raw_file.close()
+        with contextlib.suppress(FileNotFoundError):
+            temp_path.unlink()
+        raise
+
+    if fsync:
+        _fsync_directory(out_path.parent)
+
+
+def list_of_dicts_to_csv(data, out_path, compression=None, compression_level=None, fsync=False):
+    """
+    Writes data, a list of dicts (or dict-like rows) with the same keys, to the csv file specified by out_path Path
+    object.
 
     Generates the header from the keys in the first dictionary in the list
+
+    compression, compression_level, fsync:  See atomic_text_writer(). If compressing, the matching suffix is added to
+                                            out_path.
+
+    Returns the Path object the csv was written to.
     """
 
     timestamp = datetime.datetime.now().strftime('%y-%m-%d %H:%M:%S')
 
     #: Make sure our output directory exists
+    out_path = compressed_path(out_path, compression)
     out_path.parent.mkdir(parents=True, exist_ok=True)
 
     #: Get the column values from the keys of the first item
     columns = list(data[0].keys())
 
-    with open(out_path, 'w', newline='\n') as out_csv_file:
-        out_writer = csv.DictWriter(out_csv_file, fieldnames=columns, delimiter=',')
-        out_writer.writerow({columns[0]: timestamp})  #: Puts timestamp as first item in csv
-        out_writer.writeheader()
+    with atomic_text_writer(out_path, compression, compression_level, fsync) as out_csv_file:
+        out_writer = csv.writer(out_csv_file, delimiter=',')
+        #: Puts timestamp as first item in csv
+        out_writer.writerow([timestamp] + [''] * (len(columns) - 1))
+        out_writer.writerow(columns)
+        row_values = _column_getter(columns, data[0])
         for row in data:
-            out_writer.writerow(row)
+            out_writer.writerow(row_values(row))
 
+    return out_path
 
-def list_of_dicts_to_rotating_logger(data, out_path, separator='|', rotate_count=18):
-    """
-    Logs a list of dictionaries with the same keys (obtained from the first dictionary in the list) to a rotating
-    csv file via the logging module.
 
-    data:           List of dictionaries that have the same keys. Reads the keys of the first dictionary to get the
-                    column names.
-    out_path:       Path object to the base report file. Automatically rotated by a logging RotatingFileHandler on each
-                    call.
-    separator:      The character used as a csv delimiter. Default to '|' to avoid common conflicts with text data.
-    rotate_count:   The number of files to save before RotatingFileHandler deletes old reports. Defaults to 2.5 weeks
-                    of daily reports.
+def _column_getter(columns, first_row):
+    #: Returns a function that gets a row's values for columns as a tuple. Rows that keep their columns in __slots__
+    #: (tools.ItemInfoRow) are read straight from the attributes instead of going through __getitem__ for every cell.
+    if len(columns) == 1:
+        column = columns[0]
+        return lambda row: (row[column],)
+    if tuple(columns) == getattr(type(first_row), '__slots__', None):
+        return operator.attrgetter(*columns)
+    return operator.itemgetter(*columns)
+
 
+def _rotate(out_path, rotate_count):
+    #: Same naming scheme as logging.handlers.RotatingFileHandler: report.csv -> report.csv.1 -> report.csv.2 ...
+    for index in range(rotate_count - 1, 0, -1):
+        source = out_path.with_name(f'{out_path.name}.{index}')
+        if source.exists():
+            os.replace(source, out_path.with_name(f'{out_path.name}.{index + 1}'))
+    if rotate_count and out_path.exists():
+        os.replace(out_path, out_path.with_name(f'{out_path.name}.1'))
+
+
+def list_of_dicts_to_rotating_logger(  # pylint: disable=too-many-arguments
+    data, out_path, separator='|', rotate_count=18, compression=None, compression_level=None, fsync=False
+):
+    """
+    Writes a list of dictionaries with the same keys (obtained from the first dictionary in the list) to a rotating
+    csv file. Each call moves the previous files back one place (out_path to out_path.1, out_path.1 to out_path.2,
+    etc, like a logging RotatingFileHandler) and writes data to out_path.
+
+    data:               List of dictionaries that have the same keys. Reads the keys of the first dictionary to get
+                        the column names.
+    out_path:           Path object to the base report file. Automatically rotated on each call.
+    separator:          The character used as a csv delimiter. Default to '|' to avoid common conflicts with text data.
+    rotate_count:       The number of files to save before old reports are deleted. Defaults to 2.5 weeks of daily
+                        reports.
+    compression, compression_level, fsync:  See atomic_text_writer(). If compressing, the matching suffix is added to
+                                            out_path before the rotation numbers.
+
+    Returns the Path object the data was written to.
     """
 
     #: Make sure our output directory exists
+    out_path = compressed_path(out_path, compression)
     out_path.parent.mkdir(parents=True, exist_ok=True)
 
-    #: Set up a rotating file handler for the report log
-    report_logger = logging.getLogger('report_logger')
-    report_handler = logging.handlers.RotatingFileHandler(out_path, backupCount=rotate_count)
-    report_handler.doRollover()  #: Rotate the log on each run
-    report_handler.setLevel(logging.INFO)
-    report_logger.addHandler(report_handler)
-    report_logger.setLevel(logging.INFO)
-
     #: Log date
     timestamp = datetime.datetime.now().strftime('%y-%m-%d %H:%M:%S')
-    report_logger.info(timestamp)
 
     #: Get the column values from the keys of the first dict and log as csv header
     columns = list(data[0].keys())
     header = separator.join(columns)
-    report_logger.info(header)
 
-    #: Iterate through the list, using the columns generated above to ensure the order stays the same for each row.
-    for row in data:
-        item_list = [str(row[col]) for col in columns]
-        report_logger.info(separator.join(item_list))
+    #: Write the new report to a temp file first so that a failure doesn't rotate away a good report
+    temp_path = out_path.with_name(f'.{out_path.name}.new')
+    with atomic_text_writer(temp_path, compression, compression_level, fsync) as report_file:
+        report_file.write(f'{timestamp}\n{header}\n')
+
+        #: Iterate through the list, using the columns generated above to ensure the order stays the same for each
+        #: row.
+        row_values = _column_getter(columns, data[0])
+        for row in data:
+            report_file.write(separator.join(map(str, row_values(row))) + '\n')
+
+    _rotate(out_path, rotate_count)
+    os.replace(temp_path, out_path)
+    if fsync:
+        _fsync_directory(out_path.parent)
+
+    return out_path
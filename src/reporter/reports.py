@@ -3,12 +3,13 @@ Report base class and the actual report classes that inherit from it. Each class
 and a save_report method.
 """
 
-try:
-    import arcpy
-except ModuleNotFoundError:
-    pass
+import datetime
+from collections import deque
+from operator import itemgetter
+from pathlib import Path
+from time import monotonic
 
-from . import report_writers, tools
+from . import credentials_template, delta, history, pricing, report_writers, tools
 
 try:
     from . import credentials
@@ -16,15 +17,109 @@ except (ModuleNotFoundError, ImportError):
     from . import credentials_template as credentials
 
 
+#: The org's group catalog is cached alongside the AGOL usage csvs
+GROUP_CACHE_FILENAME = 'AGOLGroups_cache.json'
+
+
+def setting(name):
+    """
+    Returns the named setting from the credentials file. Settings added to the template after a credentials file was
+    copied from it fall back to the template's value, so an existing credentials file keeps working.
+    """
+
+    return getattr(credentials, name, getattr(credentials_template, name))
+
+
+def _credits_per_mb():
+    #: Credentials files from before ITEM_TYPE_CREDITS_PER_MB set the feature service rate in HFS_CREDITS_PER_MB
+    if hasattr(credentials, 'ITEM_TYPE_CREDITS_PER_MB'):
+        return credentials.ITEM_TYPE_CREDITS_PER_MB
+
+    return {**credentials_template.ITEM_TYPE_CREDITS_PER_MB, 'Feature Service': credentials.HFS_CREDITS_PER_MB}
+
+
+def _writer_options():
+    """
+    The compression and durability settings from the credentials file, as keyword arguments for report_writers.
+    """
+
+    return {
+        'compression': setting('REPORT_COMPRESSION'),
+        'compression_level': setting('REPORT_COMPRESSION_LEVEL'),
+        'fsync': setting('REPORT_FSYNC'),
+    }
+
+
+def create_agol_session(logger, max_session_minutes=None, cache_minutes=None):
+    """
+    Returns a tools.AGOLSession using the org, user, and metatables from the credentials file.
+    """
+
+    return tools.AGOLSession(
+        logger,
+        credentials.ORG,
+        credentials.USERNAME,
+        credentials.PASSWORD,
+        credentials.SGID_METATABLE,
+        credentials.AGOL_METATABLE,
+        max_session_minutes=max_session_minutes,
+        cache_minutes=cache_minutes,
+        group_cache_path=Path(credentials.REPORT_DIR, 'AGOLUsage', GROUP_CACHE_FILENAME),
+        group_cache_hours=setting('GROUP_CACHE_HOURS'),
+        http_options={
+            'pool_size': setting('AGOL_HTTP_POOL_SIZE'),
+            'timeout': setting('AGOL_HTTP_TIMEOUT'),
+        },
+    )
+
+
+def _item_priority(item_tuple, credits_per_mb):
+    #: Estimated monthly credits, so the most expensive items are processed first
+    item, _ = item_tuple
+    return (item.size or 0) * credits_per_mb.get(item.type, 0)
+
+
 class Report:
     """
-    Base class from which other reports should inherit
+    Base class from which other reports should inherit. Reports are found and loaded by name through registry.py.
+
+    Subclasses declare:
+    dependencies:       Names of packages the report needs that are slow to import (eg, arcpy). They are imported by
+                        registry.load_report() only when the report is selected.
+    writers:            The report_writers functions save_report() uses to write the report's data to out_path.
+    out_dir, out_name:  The report is saved to REPORT_DIR/out_dir/out_name_<timestamp>.csv
+    uses_agol_session:  Whether the report talks to AGOL and should be given the shared tools.AGOLSession, if any.
     """
 
+    dependencies = ()
+    writers = ()
+    out_dir = ''
+    out_name = 'Report'
+    uses_agol_session = False
+
     def __init__(self, logger, out_path):
         self.logger = logger
         self.out_path = out_path
 
+    @classmethod
+    def default_out_path(cls, timestamp):
+        """
+        Returns the path for a report created at the datetime timestamp:
+        REPORT_DIR/out_dir/out_name_<YYYYmmdd-HHMMSS>.csv
+        """
+
+        return Path(credentials.REPORT_DIR, cls.out_dir, f'{cls.out_name}_{timestamp.strftime("%Y%m%d-%H%M%S")}.csv')
+
+    @classmethod
+    def from_credentials(cls, logger, timestamp, session=None):  # pylint: disable=unused-argument
+        """
+        Create the report using its default out_path and any settings it needs from the credentials file. timestamp
+        is the datetime of the run, shared by all the reports in it. session is only passed to reports that use an
+        AGOL session.
+        """
+
+        return cls(logger, cls.default_out_path(timestamp))
+
     def create_report(self):
         """
         Return the report results in some form of data structure.
@@ -34,56 +129,164 @@ class Report:
 
     def save_report(self, data):
         """
-        Write the information in 'data' to the Report's out_path.
+        Write the information in 'data' to the Report's out_path with each of the Report's writers, using the
+        compression and durability settings from the credentials file.
         """
 
-        raise NotImplementedError('save_report not implemented')
+        for writer in self.writers:
+            written_path = writer(data, self.out_path, **_writer_options())
+            self.logger.info(f'Saved {type(self).__name__} to {written_path}')
 
 
 class AGOLUsageReport(Report):
     """
-    Reports usage of AGOL Hosted Feature Services. Relies on SGID and AGOL metatables to determine whether item is
+    Reports usage and storage cost of the hosted items whose types are priced in ITEM_TYPE_CREDITS_PER_MB (feature
+    services, tile and scene layers, and notebooks). Relies on SGID and AGOL metatables to determine whether item is
     considered part of the SGID.
+
+    session:                Optional tools.AGOLSession to reuse an existing login and cached lookups (eg, from the
+                            daemon). A new session is created for each report if not provided.
+    time_budget_minutes:    Optional limit on how long create_report() spends getting item info. Items are processed
+                            most expensive first; any left when time runs out get their sharing and usage info from
+                            the last run in the report history and are marked as stale.
+    run_time:               Optional datetime the run is stored under in the report history. Defaults to when the
+                            report is saved.
     """
 
+    dependencies = ('arcgis', 'arcpy')
+    writers = (report_writers.list_of_dicts_to_csv,)
+    out_dir = 'AGOLUsage'
+    out_name = 'AGOLReport'
+    uses_agol_session = True
+
+    def __init__(  # pylint: disable=too-many-arguments
+        self, logger, out_path, session=None, time_budget_minutes=None, run_time=None
+    ):
+        super().__init__(logger, out_path)
+        self.session = session
+        self.time_budget_minutes = time_budget_minutes
+        self.run_time = run_time
+
+    @classmethod
+    def from_credentials(cls, logger, timestamp, session=None):
+        #: The history's run_date matches the timestamp in the report's file name
+        return cls(
+            logger, cls.default_out_path(timestamp), session, setting('AGOL_TIME_BUDGET_MINUTES'), run_time=timestamp
+        )
+
     def create_report(self):
         """
-        Returns a list of dicts whose keys are column headings and values are the column values:
+        Returns a list of tools.ItemInfoRow objects, which behave like dicts whose keys are column headings and
+        values are the column values:
         [{itemid: 'some_uuid', title: 'AGOL title', ...} ...]
         """
         self.logger.info('Creating AGOL Usage Report...')
-        item_info_dicts = []
+        deadline = None
+        if self.time_budget_minutes is not None:
+            deadline = monotonic() + self.time_budget_minutes * 60
+
+        session = self.session
+        if session is None:
+            session = create_agol_session(self.logger)
+
+        org = session.organization
+        connection_stats_start = org.connection_stats_snapshot()
+        credits_per_mb = _credits_per_mb()
+        items = org.get_feature_services_in_folders(org.get_users_folders(), credits_per_mb)
+        open_data_groups = session.open_data_groups
 
-        try:
-            arcpy.SignInToPortal(credentials.ORG, credentials.USERNAME, credentials.PASSWORD)
-        except NameError as ex:  #: Travis CI throws a NameError on arcpy calls.
-            self.logger.info(ex)
+        #: Look up every item's metatable category in one pass, indexed by the item's original position
+        categories = session.metatable.categories_for(item.itemid for item, _ in items)
 
-        org = tools.Organization(self.logger, credentials.ORG, credentials.USERNAME, credentials.PASSWORD)
-        folders = org.get_users_folders()
-        items = org.get_feature_services_in_folders(folders)
-        open_data_groups = org.get_open_data_groups()
+        #: Process the most expensive items first so they're always current, even if we run out of time. Each item keeps
+        #: its original position so the report is written in the usual order.
+        #: Pop each (item, folder) tuple off the queue as it's processed so that the Item object (and its full json
+        #: payload) can be garbage collected instead of living until the report is written.
+        items = deque(
+            sorted(enumerate(items), key=lambda indexed: _item_priority(indexed[1], credits_per_mb), reverse=True)
+        )
+        indexed_rows = []
+        progress = tools.ProgressLogger(self.logger, len(items))
+        while items:
+            if deadline is not None and monotonic() >= deadline:
+                self.logger.warning(f'Time budget reached, using last-known info for the remaining {len(items)} items')
+                indexed_rows.extend(self._get_stale_rows(org, items, categories))
+                break
+            index, (item, folder) = items.popleft()
+            indexed_rows.append((index, org.get_item_info(item, open_data_groups, folder, categories[index])))
+            progress.update()
 
-        metatable = tools.Metatable(self.logger)
-        sgid_fields = ['TABLENAME', 'AGOL_ITEM_ID', 'AGOL_PUBLISHED_NAME', 'Authoritative']
-        agol_fields = ['TABLENAME', 'AGOL_ITEM_ID', 'AGOL_PUBLISHED_NAME', 'CATEGORY']
-        metatable.read_metatable(credentials.SGID_METATABLE, sgid_fields)
-        metatable.read_metatable(credentials.AGOL_METATABLE, agol_fields)
+        org.log_connection_stats(connection_stats_start)
 
-        for item_tuple in items:
-            item, folder = item_tuple
-            metatable_category = None
-            if item.itemid in metatable.metatable_dict:
-                metatable_category = metatable.metatable_dict[item.itemid].category
-            item_info_dicts.append(org.get_item_info(item, open_data_groups, folder, metatable_category))
+        indexed_rows.sort(key=itemgetter(0))
+        item_info_rows = [row for _, row in indexed_rows]
 
-        return item_info_dicts
+        pricing.apply_pricing(item_info_rows, credits_per_mb, credentials.DOLLARS_PER_CREDIT)
+
+        return item_info_rows
+
+    def _get_stale_rows(self, org, items, categories):
+        """
+        Returns (index, row) tuples for the remaining indexed (item, folder) tuples in items using their last-known
+        values from the report history (see Organization.get_stale_item_info()). Empties items.
+
+        categories: List of every item's metatable category, indexed by the item's original position
+        """
+
+        history_path = self.out_path.parent / history.HISTORY_FILENAME
+        cached_rows = {}
+        if history_path.exists():
+            with history.ReportHistory(history_path) as report_history:
+                cached_rows = report_history.latest_rows(item.itemid for _, (item, _) in items)
+
+        stale_rows = []
+        while items:
+            index, (item, folder) = items.popleft()
+            stale_rows.append(
+                (index, org.get_stale_item_info(item, folder, categories[index], cached_rows.get(item.itemid)))
+            )
+
+        return stale_rows
 
     def save_report(self, data):
         """
         Saves agol usage info contained in data to the object's out_path. The keys of the first value are used as
         the csv file's schema.
+
+        Also appends the rows to the report history database in the same directory for trend queries and writes a
+        delta report of the items that changed since the previous run.
         """
-        self.logger.info(f'Saving AGOL Usage Report to {self.out_path}...')
+        super().save_report(data)
+
+        history_path = self.out_path.parent / history.HISTORY_FILENAME
+        self.logger.info(f'Appending AGOL Usage Report to {history_path}...')
+        run_time = self.run_time or datetime.datetime.now()
+        run_date = run_time.strftime('%Y-%m-%d %H:%M:%S')
+        with history.ReportHistory(history_path) as report_history:
+            report_history.append_run(run_date, data)
+
+        self.save_delta_report(data)
+
+    def save_delta_report(self, data):
+        """
+        Compares data against the fingerprints saved by the previous run, writes any changed items to an
+        AGOLDelta_*.csv next to out_path, logs a summary of the changes, and saves data's fingerprints for next time.
+        """
+
+        fingerprint_path = self.out_path.parent / delta.FINGERPRINT_FILENAME
+        current_fingerprints = delta.item_fingerprints(data)
+        previous_fingerprints = delta.load_fingerprints(fingerprint_path)
+
+        if previous_fingerprints is None:
+            self.logger.info('No usable fingerprints from a previous run, skipping delta report')
+        else:
+            delta_rows, summary = delta.compare(previous_fingerprints, current_fingerprints)
+            self.logger.info(
+                'Changes since last run: ' + ', '.join(f'{change}: {count}' for change, count in summary.items())
+            )
+            if delta_rows:
+                delta_path = self.out_path.with_name(self.out_path.name.replace('AGOLReport', 'AGOLDelta', 1))
+                written_path = report_writers.list_of_dicts_to_csv(delta_rows, delta_path, **_writer_options())
+                self.logger.info(f'Saved AGOL Delta Report to {written_path}')
 
-        report_writers.list_of_dicts_to_csv(data, self.out_path)
+        delta.save_fingerprints(current_fingerprints, fingerprint_path)
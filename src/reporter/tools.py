@@ -1,22 +1,23 @@
 """
 Classes that do all the heavy lifting
+
+arcgis and arcpy take several seconds to import, so they are imported where they're first used rather than when this
+module is loaded. Reports that need them declare them in Report.dependencies so that they're loaded up front only when
+one of those reports is selected (see registry.py).
 """
 
 import datetime
+import json
+import logging
+import re
 import uuid
 from collections import namedtuple
-from time import sleep
+from itertools import compress, islice, repeat
+from time import monotonic, sleep
 
-try:
-    import arcgis
-    import arcpy
-except ModuleNotFoundError:
-    pass
+from . import report_writers
 
-try:
-    from . import credentials
-except (ModuleNotFoundError, ImportError):
-    from . import credentials_template as credentials
+_logger = logging.getLogger(__name__)
 
 
 def _get_sharing(item):
@@ -24,18 +25,80 @@ def _get_sharing(item):
     everyone = str(sharing['everyone'])
     org = str(sharing['org'])
     groups = ', '.join([group.title for group in sharing['groups']])
+    group_ids = frozenset(group.id for group in sharing['groups'])
+
+    return everyone, org, groups, group_ids
+
+
+def _get_basic_info(item, folder, metatable_category):
+    #: Everything in an ItemInfoRow that comes from the item object itself and doesn't require any extra requests
+    item_row = ItemInfoRow()
+    item_row['itemid'] = item.itemid
+    item_row['title'] = item.title
+    item_row['type'] = item.type
+    item_row['owner'] = item.owner
+    if folder:
+        item_row['folder'] = folder
+    else:
+        item_row['folder'] = '_root'
+    item_row['views'] = item.numViews
+    item_row['modified'] = datetime.datetime.fromtimestamp(item.modified / 1000).strftime('%Y-%m-%d %H:%M:%S')
+    item_row['authoritative'] = item.content_status
+
+    #: Item is part of SGID if its metatable group is 'static' 'SGID'
+    item_row['in_sgid'] = 'False'
+    if metatable_category == 'static' or metatable_category == 'SGID':
+        item_row['in_sgid'] = 'True'
 
-    return everyone, org, groups
+    item_row['tags'] = ', '.join(item.tags)
+    #: monthly_credits and monthly_cost are calculated for the whole inventory at once by pricing.apply_pricing()
+    item_row['sizeMB'] = item.size / 1024 / 1024
+
+    return item_row
+
+
+def _read_group_catalog(cache_path, max_cache_hours):
+    #: Returns None if the cache doesn't exist, can't be read, isn't shaped like a cache, or is too old
+    try:
+        with open(cache_path, 'r', encoding='utf-8') as cache_file:
+            cache = json.load(cache_file)
+    except (OSError, ValueError):
+        return None
+
+    if not isinstance(cache, dict) or not isinstance(cache.get('groups'), dict):
+        return None
+
+    try:
+        age_hours = (datetime.datetime.now().timestamp() - cache.get('cached_at', 0)) / 3600
+    except TypeError:
+        return None
+    if max_cache_hours is not None and age_hours >= max_cache_hours:
+        return None
+
+    groups = cache['groups']
+    if not all(isinstance(group, dict) and {'title', 'isOpenData'} <= group.keys() for group in groups.values()):
+        return None
+
+    return groups
+
+
+def _write_group_catalog(cache_path, catalog):
+    cache_path.parent.mkdir(parents=True, exist_ok=True)
+    with report_writers.atomic_text_writer(cache_path) as cache_file:
+        json.dump({'cached_at': datetime.datetime.now().timestamp(), 'groups': catalog}, cache_file)
 
 
 def _get_usage(item):
     return int(item.usage('1Y').sum())
 
 
-def retry(worker, verbose=True, tries=1):
+def retry(worker, verbose=True, tries=1, logger=None):
     """
     Helper function to retry a function or method with an incremental wait time.
     Useful for methods reliant on unreliable network connections.
+
+    logger:     Logger for the retry messages. Defaults to this module's logger, which goes through the same handlers
+                as the 'reporter' logger.
     """
     max_tries = 3
     delay = 2  #: in seconds
@@ -48,19 +111,170 @@ def retry(worker, verbose=True, tries=1):
         if tries <= max_tries:
             wait_time = delay**tries
             if verbose:
-                print(f'Exception "{error}" thrown on "{worker}". Retrying after {wait_time} seconds...')
+                (logger or _logger).warning(
+                    'Exception "%s" thrown on "%s". Retrying after %s seconds...', error, worker, wait_time
+                )
             sleep(wait_time)
-            retry(worker, verbose, tries + 1)
-        else:
-            raise error
+            return retry(worker, verbose, tries + 1, logger)
+        raise error
+
+
+#: The columns of the AGOL usage report, in output order. New columns go at the end so that readers that rely on
+#: column positions keep working.
+ITEM_INFO_COLUMNS = (
+    'itemid',
+    'title',
+    'owner',
+    'folder',
+    'views',
+    'modified',
+    'authoritative',
+    'sharing_everyone',
+    'sharing_org',
+    'sharing_groups',
+    'open_data_group',
+    'in_sgid',
+    'tags',
+    'sizeMB',
+    'monthly_credits',
+    'monthly_cost',
+    'data_requests_1Y',
+    'type',
+    'stale',
+)
+
+#: For constant-time column name checks; 'in' on the tuple itself is a linear scan
+_ITEM_INFO_COLUMN_SET = frozenset(ITEM_INFO_COLUMNS)
+
+
+class ItemInfoRow:
+    """
+    A single row of the AGOL usage report with a fixed schema (ITEM_INFO_COLUMNS).
+
+    Uses __slots__ rather than a per-row dict so that large inventories don't carry a hash table and a copy of every
+    key for each item. Supports the parts of the dict interface the report writers rely on: keys(), values(),
+    items(), 'in', and getting/setting values by column name. Unset columns are None.
+    """
+
+    __slots__ = ITEM_INFO_COLUMNS
+
+    def __init__(self, **values):
+        for column in self.__slots__:
+            setattr(self, column, values.pop(column, None))
+        if values:
+            raise KeyError(f'Unknown columns: {", ".join(values)}')
+
+    def __getitem__(self, column):
+        if column not in _ITEM_INFO_COLUMN_SET:
+            raise KeyError(column)
+        return getattr(self, column)
+
+    def __setitem__(self, column, value):
+        if column not in _ITEM_INFO_COLUMN_SET:
+            raise KeyError(column)
+        setattr(self, column, value)
+
+    def __contains__(self, column):
+        return column in _ITEM_INFO_COLUMN_SET
+
+    def __iter__(self):
+        return iter(self.__slots__)
+
+    def __len__(self):
+        return len(self.__slots__)
+
+    def __eq__(self, other):
+        if isinstance(other, ItemInfoRow):
+            return self.values() == other.values()
+        if isinstance(other, dict):
+            return self.as_dict() == other
+        return NotImplemented
+
+    def __repr__(self):
+        return f'ItemInfoRow({self.as_dict()!r})'
+
+    def keys(self):
+        """The column names, in output order"""
+        return list(self.__slots__)
+
+    def values(self):
+        """The column values, in output order"""
+        return [getattr(self, column) for column in self.__slots__]
+
+    def items(self):
+        """(column, value) pairs, in output order"""
+        return list(zip(self.__slots__, self.values()))
+
+    def get(self, column, default=None):
+        """dict.get() equivalent"""
+        if column not in _ITEM_INFO_COLUMN_SET:
+            return default
+        return getattr(self, column)
+
+    def as_dict(self):
+        """Returns the row as a regular dict"""
+        return dict(self.items())
+
+
+class ProgressLogger:  # pylint: disable=too-few-public-methods
+    """
+    Logs progress through a known number of things at most once every interval_seconds, eg
+    '1200/4800 items, 35.0 items/s, ETA 1m 43s', instead of a line for every item. Always logs the final count.
+
+    logger:             Logger to log progress lines to
+    total:              Total number of things to be processed
+    noun:               What's being processed, for the message. Defaults to 'items'.
+    interval_seconds:   Minimum time between progress lines. Defaults to 10 seconds.
+    """
+
+    def __init__(self, logger, total, noun='items', interval_seconds=10):
+        self.logger = logger
+        self.total = total
+        self.noun = noun
+        self.interval_seconds = interval_seconds
+        self.done = 0
+        self.started = monotonic()
+        self.last_logged = self.started
+
+    @staticmethod
+    def _format_duration(seconds):
+        minutes, seconds = divmod(int(seconds), 60)
+        hours, minutes = divmod(minutes, 60)
+        if hours:
+            return f'{hours}h {minutes}m'
+        if minutes:
+            return f'{minutes}m {seconds}s'
+        return f'{seconds}s'
+
+    def update(self, count=1):
+        """
+        Record that count more things have been processed, logging a progress line if it's been long enough.
+        """
+
+        self.done += count
+        now = monotonic()
+        if now - self.last_logged < self.interval_seconds and self.done < self.total:
+            return
+
+        self.last_logged = now
+        elapsed = now - self.started
+        rate = self.done / elapsed if elapsed else 0
+        message = f'{self.done}/{self.total} {self.noun}, {rate:.1f} {self.noun}/s'
+        if self.done < self.total and rate:
+            message += f', ETA {self._format_duration((self.total - self.done) / rate)}'
+        self.logger.info(message)
 
 
 class Organization:
     """
     An ArcGIS Online organization gis object and all the operations performed through it
+
+    http_options:   Optional dict of keyword arguments for transport.get_shared_adapter() (pool_size, timeout). If
+                    given, the gis's requests go through the shared, tuned transport. Otherwise arcgis's default
+                    transport is used.
     """
 
-    def __init__(self, logger, org, username, password):
+    def __init__(self, logger, org, username, password, http_options=None):  # pylint: disable=too-many-arguments
 
         self.logger = logger
         self.logger.info('==========')
@@ -68,9 +282,44 @@ class Organization:
         self.logger.info(f'User: {username}')
         self.logger.info('==========')
 
+        import arcgis  # pylint: disable=import-outside-toplevel
+
         self.gis = arcgis.gis.GIS(org, username, password)
         self.user_item = self.gis.users.me  # pylint: disable=no-member
 
+        self.transport_adapter = None
+        if http_options is not None:
+            from . import transport  # pylint: disable=import-outside-toplevel
+
+            adapter = transport.get_shared_adapter(**http_options)
+            if transport.mount(self.gis, adapter):
+                self.transport_adapter = adapter
+            else:
+                self.logger.info('Could not find the GIS\'s requests session, using the default transport')
+
+    def connection_stats_snapshot(self):
+        """
+        Returns the shared transport's current (requests, new_connections) counts to pass to log_connection_stats()
+        at the end of a run, or None if it isn't being used.
+        """
+
+        if self.transport_adapter is None:
+            return None
+        return self.transport_adapter.connection_stats()
+
+    def log_connection_stats(self, since=None):
+        """
+        Logs how often the shared transport reused connections since the connection_stats_snapshot() since (or since
+        the transport was created). Does nothing if it isn't being used.
+        """
+
+        if self.transport_adapter is None:
+            return
+
+        from . import transport  # pylint: disable=import-outside-toplevel
+
+        self.logger.info(transport.format_stats(self.transport_adapter, since or (0, 0)))
+
     def get_users_folders(self):
         """Get all the Feature Service item objects in the user's folders"""
 
@@ -82,93 +331,130 @@ class Organization:
 
         return folders
 
-    def get_feature_services_in_folders(self, folders):
+    def get_feature_services_in_folders(self, folders, item_types=('Feature Service',)):
         """
-        Get info for every item in every folder
+        Get every item of one of item_types in every folder
+
+        item_types: Collection of the AGOL item types to include. Defaults to just hosted feature services.
 
         Returns a list of tuples: [(item_object, folder_name), ... ]
         """
 
-        feature_service_items = []
+        item_types = frozenset(item_types)
+        inventory_items = []
 
         self.logger.info('Getting item objects...')
         for folder in folders:
             for item in self.user_item.items(folder, 1000):
-                if item.type == 'Feature Service':
-                    feature_service_items.append((item, folder))
+                if item.type in item_types:
+                    inventory_items.append((item, folder))
 
-        return feature_service_items
+        return inventory_items
 
-    def get_open_data_groups(self):
+    def get_open_data_groups(self, cache_path=None, max_cache_hours=20):
         """
-        Returns a list of the organization's groups that are enabled for Open Data
+        Returns a dict of the organization's groups that are enabled for Open Data, keyed by group id:
+        {group_id: group_title, ...}
+
+        cache_path:         Optional Path object to a json file that caches the org's whole group catalog between
+                            runs so that every group doesn't have to be paged through on each run.
+        max_cache_hours:    Search the org's groups again once the cache is this old. None to never expire it.
         """
         self.logger.info('Getting Open Data groups...')
-        open_data_groups = []
-        org_groups = self.gis.groups.search()  # pylint: disable=no-member
-        for group in org_groups:
-            if hasattr(group, 'isOpenData') and group.isOpenData:
-                open_data_groups.append(group.title)
 
-        return open_data_groups
+        catalog = None
+        if cache_path:
+            catalog = _read_group_catalog(cache_path, max_cache_hours)
+
+        if catalog is None:
+            catalog = {}
+            org_groups = self.gis.groups.search()  # pylint: disable=no-member
+            for group in org_groups:
+                catalog[group.id] = {
+                    'title': group.title,
+                    'isOpenData': bool(hasattr(group, 'isOpenData') and group.isOpenData),
+                }
+            if cache_path:
+                _write_group_catalog(cache_path, catalog)
+
+        return {group_id: group['title'] for group_id, group in catalog.items() if group['isOpenData']}
 
     def get_item_info(self, item, open_data_groups, folder, metatable_category):
         """
         Given an item object and a string representing the name of the folder it
-        resides in, item_info builds a dictionary containing pertinent info about
+        resides in, item_info builds an ItemInfoRow containing pertinent info about
         that item.
+
+        open_data_groups is the {group_id: group_title} dict from get_open_data_groups().
         """
-        self.logger.info(f'Getting info for {item.title}...')
-        item_dict = {}
-        item_dict['itemid'] = item.itemid
-        item_dict['title'] = item.title
-        item_dict['owner'] = item.owner
-        if folder:
-            item_dict['folder'] = folder
-        else:
-            item_dict['folder'] = '_root'
-        item_dict['views'] = item.numViews
-        item_dict['modified'] = datetime.datetime.fromtimestamp(item.modified / 1000).strftime('%Y-%m-%d %H:%M:%S')
-        item_dict['authoritative'] = item.content_status
+        self.logger.debug('Getting info for %s...', item.title)
+        item_row = _get_basic_info(item, folder, metatable_category)
+        item_row['stale'] = 'False'
 
         #: Sometimes we get a permission denied error on group listing, so call retry() and then wrap that in a
         #: try/except to keep moving if it really bombs out
         try:
-            item_dict['sharing_everyone'], item_dict['sharing_org'], item_dict['sharing_groups'] = retry(
-                lambda: _get_sharing(item)
+            item_row['sharing_everyone'], item_row['sharing_org'], item_row['sharing_groups'], group_ids = retry(
+                lambda: _get_sharing(item), logger=self.logger
             )
         except:  # pylint: disable=bare-except
-            item_dict['sharing_everyone'] = item_dict['sharing_org'] = item_dict['sharing_groups'] = 'sharing_error'
+            item_row['sharing_everyone'] = item_row['sharing_org'] = item_row['sharing_groups'] = 'sharing_error'
+            group_ids = None
 
         #: Check if any of the item's groups are enabled for Open Data
-        is_open_data = False
-        for group in item_dict['sharing_groups'].split(', '):
-            if group in open_data_groups:
-                is_open_data = True
-                break
-        if item_dict['sharing_groups'] == 'sharing_error':
-            item_dict['open_data_group'] = 'group error'
+        if group_ids is None:
+            item_row['open_data_group'] = 'group error'
         else:
-            item_dict['open_data_group'] = str(is_open_data)
-
-        #: Item is part of SGID if its metatable group is 'static' 'SGID'
-        item_dict['in_sgid'] = 'False'
-        if metatable_category == 'static' or metatable_category == 'SGID':
-            item_dict['in_sgid'] = 'True'
-
-        item_dict['tags'] = ', '.join(item.tags)
-        size_in_mb = item.size / 1024 / 1024
-        item_dict['sizeMB'] = size_in_mb
-        item_dict['monthly_credits'] = size_in_mb * credentials.HFS_CREDITS_PER_MB
-        item_dict['monthly_cost'] = size_in_mb * credentials.HFS_CREDITS_PER_MB * credentials.DOLLARS_PER_CREDIT
+            item_row['open_data_group'] = str(not group_ids.isdisjoint(open_data_groups))
 
         #: Sometimes data usage also gives an error, so try/except that as well
         try:
-            item_dict['data_requests_1Y'] = retry(lambda: _get_usage(item))
+            item_row['data_requests_1Y'] = retry(lambda: _get_usage(item), logger=self.logger)
         except:  # pylint: disable=bare-except
-            item_dict['data_requests_1Y'] = 'error'
+            item_row['data_requests_1Y'] = 'error'
+
+        return item_row
+
+    def get_stale_item_info(self, item, folder, metatable_category, cached_row):
+        """
+        Builds an ItemInfoRow for an item that there wasn't time to process fully. Everything that comes straight
+        from the item object is current, but the sharing and usage info (which need extra requests to AGOL) are copied
+        from cached_row, the item's last-known values (eg, from history.ReportHistory.latest_rows()). If there is no
+        cached_row, they are left empty (None) since they aren't known. The row's 'stale' column is 'True'.
+        """
+        self.logger.debug('Using last-known info for %s...', item.title)
+        item_row = _get_basic_info(item, folder, metatable_category)
+        item_row['stale'] = 'True'
+
+        for column in ('sharing_everyone', 'sharing_org', 'sharing_groups', 'open_data_group', 'data_requests_1Y'):
+            item_row[column] = cached_row.get(column) if cached_row else None
+
+        return item_row
+
+
+_AGOL_ITEMID = re.compile('[0-9a-fA-F]{32}')
+
+
+def _valid_itemid_mask(itemids):
+    #: Item IDs are UUIDs. If we can't parse the item id listed in the table, it means the layer is not in AGOL and
+    #: the row should be skipped (catches both magic words and empty entries). The same magic words show up over and
+    #: over, so each distinct value is only checked once. AGOL writes item ids as 32 hex digits, which are matched
+    #: without parsing; anything else gets the full UUID parse.
+    validity = {}
+    for itemid in set(itemids):
+        if isinstance(itemid, str) and _AGOL_ITEMID.fullmatch(itemid):
+            validity[itemid] = True
+            continue
+        try:
+            uuid.UUID(itemid)
+            validity[itemid] = True
+        except (AttributeError, ValueError, TypeError):
+            validity[itemid] = False
 
-        return item_dict
+    return list(map(validity.__getitem__, itemids))
+
+
+MetatableRow = namedtuple('MetatableRow', ['sgid_name', 'agol_name', 'category', 'authoritative'])
 
 
 class Metatable:
@@ -179,8 +465,14 @@ class Metatable:
         {item_id: [sgid_name, agol_name, category, authoritative]}
     Any duplicate item ids (either a table has the same AGOL item in more than one row, or the item id exists in
     multiple tables) are added to the self.duplicate_keys list.
+
+    The table is read in batches of batch_size rows, each of which is split into columns that are validated,
+    de-duplicated, and added to metatable_dict as a whole rather than row by row. duplicate_keys lists each duplicate
+    row's item id in the order the rows were read.
     """
 
+    batch_size = 5000
+
     def __init__(self, logger):
         #: A dictionary of the metatable records, indexed by the metatable's itemid
         #: values: {item_id: [sgid_name, agol_name, category, authoritative]}
@@ -199,36 +491,61 @@ class Metatable:
 
         self.logger.info(f'Reading in {table}...')
 
-        MetatableRow = namedtuple('MetatableRow', ['sgid_name', 'agol_name', 'category', 'authoritative'])
+        #: If table is from SGID, get "authoritative" from table and set "category" to SGID. Otherwise, get "category"
+        #: from table and set "authoritative" to 'n'.
+        #: SGID's AGOLItems table has "Authoritative" field, shelved table does not.
+        sgid_table = 'Authoritative' in fields
 
-        for row in self._cursor_wrapper(table, fields):
+        rows = iter(self._cursor_wrapper(table, fields))
+        while True:
+            batch = list(islice(rows, self.batch_size))
+            if not batch:
+                break
 
-            #: If table is from SGID, get "authoritative" from table and set "category" to SGID. Otherwise,
-            #: get "category" from table and set "authoritative" to 'n'.
-            #: SGID's AGOLItems table has "Authoritative" field, shelved table does not.
-            if 'Authoritative' in fields:
-                table_sgid_name, table_agol_itemid, table_agol_name, table_authoritative = row
-                table_category = 'SGID'
-            else:
-                table_sgid_name, table_agol_itemid, table_agol_name, table_category = row
-                table_authoritative = 'n'
-
-            #: Item IDs are UUIDs. If we can't parse the item id listed in the table, it means the layer is not
-            #: in AGOL and this row should be skipped (catches both magic words and empty entries)
-            try:
-                uuid.UUID(table_agol_itemid)
-            except (AttributeError, ValueError, TypeError):
-                continue
-
-            if table_agol_itemid not in self.metatable_dict:
-                self.metatable_dict[table_agol_itemid] = MetatableRow(
-                    table_sgid_name,
-                    table_agol_name,
-                    table_category,
-                    table_authoritative,
-                )
+            sgid_names, itemids, agol_names, last_column = zip(*batch)
+            if sgid_table:
+                categories, authoritatives = repeat('SGID'), last_column
             else:
-                self.duplicate_keys.append(table_agol_itemid)
+                categories, authoritatives = last_column, repeat('n')
+
+            self._add_columns(itemids, (sgid_names, agol_names, categories, authoritatives))
+
+    def _add_columns(self, itemids, columns):
+        """
+        Adds a batch of rows, given as an itemid column and the MetatableRow columns, to self.metatable_dict. Rows
+        with invalid itemids are dropped. The first row for an itemid wins; every other row for it, in this batch or
+        an earlier one, is added to self.duplicate_keys.
+        """
+
+        mask = _valid_itemid_mask(itemids)
+        itemids = list(compress(itemids, mask))
+        rows = list(map(MetatableRow._make, zip(*(compress(column, mask) for column in columns))))
+
+        #: Reversed so that the first row for each itemid is the one that's kept
+        first_rows = dict(zip(reversed(itemids), reversed(rows)))
+        existing = self.metatable_dict
+
+        #: Most batches have no duplicates at all, which the two set-sized checks rule out without visiting each row
+        if len(first_rows) < len(itemids) or not first_rows.keys().isdisjoint(existing):
+            seen = set()
+            for itemid in itemids:
+                if itemid in seen or itemid in existing:
+                    self.duplicate_keys.append(itemid)
+                else:
+                    seen.add(itemid)
+            for itemid in first_rows.keys() & existing.keys():
+                del first_rows[itemid]
+
+        self.metatable_dict.update(first_rows)
+
+    def categories_for(self, itemids):
+        """
+        Joins itemids against the metatable, returning a list of each item's category (None if it isn't in the
+        metatable) in the same order as itemids.
+        """
+
+        rows = map(self.metatable_dict.get, itemids)
+        return [row.category if row is not None else None for row in rows]
 
     def _cursor_wrapper(self, table, fields):
         """
@@ -238,6 +555,140 @@ class Metatable:
         fields:     List of fields names to access in the table.
         """
 
+        import arcpy  # pylint: disable=import-outside-toplevel
+
         with arcpy.da.SearchCursor(table, fields) as search_cursor:
             for row in search_cursor:
                 yield row
+
+
+class AGOLSession:  # pylint: disable=too-many-instance-attributes
+    """
+    An authenticated AGOL Organization and the lookups every AGOL report needs (the Open Data groups and the SGID and
+    AGOL metatables), created on first use and then reused.
+
+    A one-off run uses the defaults and never expires anything. A long-running process (see daemon.py) sets
+    max_session_minutes to log back in before the AGOL token expires and cache_minutes to re-read the lookups
+    periodically, and calls refresh() while idle so that the next report doesn't have to wait on either.
+
+    logger:                 Logger for progress messages
+    org, username,
+    password:               AGOL org URL and credentials
+    sgid_metatable,
+    agol_metatable:         Paths to the SGID AGOLItems table and the AGOL AGOLItems_shelved table
+    max_session_minutes:    Log back in once the session is this old. None to never log back in.
+    cache_minutes:          Re-read the groups and metatables once they are this old. None to keep them forever.
+    group_cache_path,
+    group_cache_hours:      Optional json cache of the org's group catalog that persists between runs, and how long
+                            it's used before the org's groups are searched again (see
+                            Organization.get_open_data_groups()).
+    http_options:           Optional settings for the shared HTTP transport (see Organization).
+    """
+
+    sgid_fields = ['TABLENAME', 'AGOL_ITEM_ID', 'AGOL_PUBLISHED_NAME', 'Authoritative']
+    agol_fields = ['TABLENAME', 'AGOL_ITEM_ID', 'AGOL_PUBLISHED_NAME', 'CATEGORY']
+
+    def __init__(  # pylint: disable=too-many-arguments
+        self,
+        logger,
+        org,
+        username,
+        password,
+        sgid_metatable,
+        agol_metatable,
+        max_session_minutes=None,
+        cache_minutes=None,
+        group_cache_path=None,
+        group_cache_hours=20,
+        http_options=None
+    ):
+        self.logger = logger
+        self.org_url = org
+        self.username = username
+        self.password = password
+        self.sgid_metatable = sgid_metatable
+        self.agol_metatable = agol_metatable
+        self.max_session_minutes = max_session_minutes
+        self.cache_minutes = cache_minutes
+        self.group_cache_path = group_cache_path
+        self.group_cache_hours = group_cache_hours
+        self.http_options = http_options
+
+        self._organization = None
+        self._signed_in_at = None
+        self._open_data_groups = None
+        self._metatable = None
+        self._cached_at = None
+
+    @staticmethod
+    def _is_stale(timestamp, max_minutes):
+        if timestamp is None:
+            return True
+        if max_minutes is None:
+            return False
+        return monotonic() - timestamp >= max_minutes * 60
+
+    def sign_in(self):
+        """
+        Sign in to the portal for arcpy (needed to read the AGOL-hosted metatable) and create a new Organization.
+
+        arcpy is required; it's one of AGOLUsageReport's declared dependencies, so registry.load_report() has already
+        failed with a clear error if it isn't installed.
+        """
+
+        import arcpy  # pylint: disable=import-outside-toplevel
+
+        arcpy.SignInToPortal(self.org_url, self.username, self.password)
+
+        self._organization = Organization(
+            self.logger, self.org_url, self.username, self.password, http_options=self.http_options
+        )
+        self._signed_in_at = monotonic()
+
+    def load_lookups(self):
+        """
+        (Re-)read the Open Data groups and both metatables.
+        """
+
+        self._open_data_groups = self.organization.get_open_data_groups(self.group_cache_path, self.group_cache_hours)
+
+        metatable = Metatable(self.logger)
+        metatable.read_metatable(self.sgid_metatable, self.sgid_fields)
+        metatable.read_metatable(self.agol_metatable, self.agol_fields)
+        self._metatable = metatable
+
+        self._cached_at = monotonic()
+
+    def refresh(self):
+        """
+        Proactively sign back in and/or re-read the lookups if they have expired. Does nothing if they're current.
+        """
+
+        if self._is_stale(self._signed_in_at, self.max_session_minutes):
+            self.sign_in()
+        if self._is_stale(self._cached_at, self.cache_minutes):
+            self.load_lookups()
+
+    @property
+    def organization(self):
+        """The signed-in Organization, signing in again if the session has expired"""
+
+        if self._is_stale(self._signed_in_at, self.max_session_minutes):
+            self.sign_in()
+        return self._organization
+
+    @property
+    def open_data_groups(self):
+        """The org's Open Data groups (see Organization.get_open_data_groups())"""
+
+        if self._is_stale(self._cached_at, self.cache_minutes):
+            self.load_lookups()
+        return self._open_data_groups
+
+    @property
+    def metatable(self):
+        """A Metatable holding both the SGID and AGOL metatables"""
+
+        if self._is_stale(self._cached_at, self.cache_minutes):
+            self.load_lookups()
+        return self._metatable
@@ -0,0 +1,128 @@
+"""
+A shared, tuned HTTP transport for all of reporter's AGOL traffic.
+
+Every arcgis.gis.GIS object gets its own requests session and, with it, its own pool of TLS connections, so each new
+GIS (eg, when the daemon logs back in) starts by paying for fresh TLS handshakes. Mounting one shared adapter on every
+GIS's session keeps the connections pooled and alive across GIS objects, with a pool sized for the number of threads
+making requests and a default timeout so a stalled request can't hang a run.
+
+The adapter also counts the requests it sends and the connections it opens so that each run can report how often
+connections were reused (see connection_stats() and format_stats()).
+
+requests is installed with arcgis, so this module is only imported by the code that creates GIS objects.
+"""
+
+import threading
+
+import requests
+import requests.adapters
+
+#: The adapter shared by every GIS session; see get_shared_adapter()
+_shared_adapter = None  # pylint: disable=invalid-name
+
+
+class TunedHTTPAdapter(requests.adapters.HTTPAdapter):
+    """
+    An HTTPAdapter with a default timeout and connection reuse counters.
+
+    pool_size:  Number of connections kept alive per host and number of hosts pooled. Match this to the number of
+                threads making AGOL requests at once.
+    timeout:    Default (connect, read) timeout in seconds for requests that don't set their own.
+    """
+
+    def __init__(self, pool_size=10, timeout=(10, 120)):
+        self.timeout = timeout
+        self._stats_lock = threading.Lock()
+        self._requests_sent = 0
+        self._new_connections = 0
+        super().__init__(pool_connections=pool_size, pool_maxsize=pool_size)
+
+    def init_poolmanager(self, *args, **kwargs):  # pylint: disable=signature-differs
+        super().init_poolmanager(*args, **kwargs)
+
+        #: Count new connections as the pools open them. The counts live on the adapter, so they survive the pool
+        #: manager evicting a host's pool.
+        adapter = self
+
+        def _counting_pool_class(pool_class):
+
+            class CountingConnectionPool(pool_class):  # pylint: disable=too-few-public-methods
+                """A connection pool that counts each new connection on the adapter"""
+
+                def _new_conn(self):
+                    adapter._count(new_connections=1)  # pylint: disable=protected-access
+                    return super()._new_conn()
+
+            return CountingConnectionPool
+
+        self.poolmanager.pool_classes_by_scheme = {
+            scheme: _counting_pool_class(pool_class)
+            for scheme, pool_class in self.poolmanager.pool_classes_by_scheme.items()
+        }
+
+    def _count(self, requests_sent=0, new_connections=0):
+        with self._stats_lock:
+            self._requests_sent += requests_sent
+            self._new_connections += new_connections
+
+    def send(self, request, **kwargs):  # pylint: disable=arguments-differ
+        if kwargs.get('timeout') is None:
+            kwargs['timeout'] = self.timeout
+        self._count(requests_sent=1)
+        return super().send(request, **kwargs)
+
+    def connection_stats(self):
+        """
+        Returns (requests, new_connections) sent and opened through this adapter since it was created. Every request
+        that didn't need a new connection reused a kept-alive one. Pass a snapshot to format_stats() to report on just
+        the requests made since the snapshot was taken.
+        """
+
+        with self._stats_lock:
+            return self._requests_sent, self._new_connections
+
+
+def get_shared_adapter(pool_size=10, timeout=(10, 120)):
+    """
+    Returns the process-wide TunedHTTPAdapter, creating it with pool_size and timeout on the first call. Later calls
+    return the same adapter regardless of their arguments.
+    """
+
+    global _shared_adapter  # pylint: disable=global-statement
+    if _shared_adapter is None:
+        _shared_adapter = TunedHTTPAdapter(pool_size, timeout)
+
+    return _shared_adapter
+
+
+def mount(gis, adapter):
+    """
+    Routes all of gis's requests through adapter. requests already asks for keep-alive, gzip-compressed responses by
+    default, so the session's headers are left alone.
+
+    Returns False (and leaves gis alone) if gis's requests session can't be found, eg in a version of arcgis that
+    doesn't use one.
+    """
+
+    session = getattr(getattr(gis, '_con', None), '_session', None)
+    if not isinstance(session, requests.Session):
+        return False
+
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+
+    return True
+
+
+def format_stats(adapter, since=(0, 0)):
+    """
+    Returns a one-line summary of adapter's connection reuse for the run's log.
+
+    since:  A connection_stats() snapshot taken at the start of the run, so that only the run's own requests are
+            counted. Defaults to everything since the adapter was created.
+    """
+
+    requests_sent, new_connections = (total - previous for total, previous in zip(adapter.connection_stats(), since))
+    reuse_rate = (requests_sent - new_connections) / requests_sent if requests_sent else 0
+
+    return f'HTTP: {requests_sent} requests over {new_connections} new connections ({reuse_rate:.0%} reused)'
@@ -0,0 +1,134 @@
+"""
+Throughput and peak memory benchmarks for the report writers and Metatable on synthetic data.
+
+Run just the benchmarks and save a baseline:
+    pytest tests/test_benchmarks.py --benchmark-only --benchmark-autosave
+
+Then, after a change, fail if any hot path got more than 10% slower than the baseline:
+    pytest tests/test_benchmarks.py --benchmark-only --benchmark-compare --benchmark-compare-fail=mean:10%
+
+The row counts default to 10,000 so the normal test run stays fast; set REPORTER_BENCHMARK_ROWS to a comma-separated
+list (eg, 10000,100000,1000000) to see how they scale. Rows per second and peak traced memory are saved in each
+benchmark's extra_info.
+"""
+
+import os
+import tracemalloc
+import uuid
+
+import pytest
+
+from reporter import report_writers, tools
+
+pytest.importorskip('pytest_benchmark')
+
+ROW_COUNTS = [int(count) for count in os.environ.get('REPORTER_BENCHMARK_ROWS', '10000').split(',')]
+
+
+def _item_info_rows(count):
+    #: Report rows shaped like a real run's output
+    types = ['Feature Service', 'Vector Tile Service', 'Map Service', 'Scene Service']
+    rows = []
+    for index in range(count):
+        rows.append(
+            tools.ItemInfoRow(
+                itemid=uuid.UUID(int=index).hex,
+                title=f'Utah Test Layer {index}',
+                type=types[index % len(types)],
+                owner='UtahAGRC',
+                folder=f'folder{index % 20}',
+                views=index * 7,
+                modified='2020-12-01 00:00:00',
+                authoritative='public_authoritative',
+                sharing_everyone='True',
+                sharing_org='True',
+                sharing_groups='Utah SGID Boundaries, Utah SGID Open Data',
+                open_data_group='True',
+                in_sgid='True',
+                tags='boundaries, utah, sgid',
+                sizeMB=index / 100,
+                monthly_credits=index * 0.0024,
+                monthly_cost=index * 0.00024,
+                data_requests_1Y=index * 3,
+                stale='False',
+            )
+        )
+
+    return rows
+
+
+def _metatable_rows(count):
+    #: Every tenth row has a magic word instead of an item id and every fiftieth repeats the previous row's item id
+    rows = []
+    for index in range(count):
+        if index % 10 == 9:
+            itemid = 'not in agol'
+        elif index % 50 == 25:
+            itemid = uuid.UUID(int=index - 1).hex
+        else:
+            itemid = uuid.UUID(int=index).hex
+        rows.append((f'SGID.TEST.Layer{index}', itemid, f'Utah Test Layer {index}', 'y'))
+
+    return rows
+
+
+def _record_throughput_and_memory(benchmark, row_count, function, *args):
+    """
+    Runs function(*args) once more under tracemalloc and stores the peak memory and the benchmark's rows per second
+    in benchmark.extra_info. Does nothing if benchmarking is disabled (--benchmark-disable).
+    """
+
+    if benchmark.disabled:
+        return
+
+    tracemalloc.start()
+    try:
+        function(*args)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    benchmark.extra_info['rows'] = row_count
+    benchmark.extra_info['rows_per_second'] = round(row_count / benchmark.stats.stats.mean)
+    benchmark.extra_info['peak_memory_mb'] = round(peak / 1024 / 1024, 2)
+
+
+@pytest.mark.parametrize('row_count', ROW_COUNTS)
+def test_benchmark_list_of_dicts_to_csv(benchmark, tmp_path, row_count):
+    rows = _item_info_rows(row_count)
+    out_path = tmp_path / 'AGOLReport.csv'
+
+    benchmark(report_writers.list_of_dicts_to_csv, rows, out_path)
+
+    _record_throughput_and_memory(benchmark, row_count, report_writers.list_of_dicts_to_csv, rows, out_path)
+    assert out_path.exists()
+
+
+@pytest.mark.parametrize('row_count', ROW_COUNTS)
+def test_benchmark_list_of_dicts_to_rotating_logger(benchmark, tmp_path, row_count):
+    rows = _item_info_rows(row_count)
+    out_path = tmp_path / 'AGOLReport.csv'
+
+    benchmark(report_writers.list_of_dicts_to_rotating_logger, rows, out_path, rotate_count=2)
+
+    _record_throughput_and_memory(
+        benchmark, row_count, report_writers.list_of_dicts_to_rotating_logger, rows, out_path, '|', 2
+    )
+    assert out_path.exists()
+
+
+@pytest.mark.parametrize('row_count', ROW_COUNTS)
+def test_benchmark_read_metatable(benchmark, mocker, row_count):
+    rows = _metatable_rows(row_count)
+    mocker.patch('reporter.tools.Metatable._cursor_wrapper', lambda self, table, fields: iter(rows))
+
+    def read_metatable():
+        metatable = tools.Metatable(mocker.Mock())
+        metatable.read_metatable('something', tools.AGOLSession.sgid_fields)
+        return metatable
+
+    metatable = benchmark(read_metatable)
+
+    _record_throughput_and_memory(benchmark, row_count, read_metatable)
+    assert metatable.duplicate_keys
+    assert len(metatable.metatable_dict) + len(metatable.duplicate_keys) == row_count - row_count // 10
@@ -0,0 +1,72 @@
+import datetime
+
+import pytest
+from reporter import daemon
+
+
+def test_cron_schedule_daily_next_run():
+    schedule = daemon.CronSchedule('0 2 * * *')
+
+    assert schedule.next_run(datetime.datetime(2020, 12, 25, 1, 59, 30)) == datetime.datetime(2020, 12, 25, 2, 0)
+    assert schedule.next_run(datetime.datetime(2020, 12, 25, 2, 0)) == datetime.datetime(2020, 12, 26, 2, 0)
+
+
+def test_cron_schedule_steps_and_lists():
+    schedule = daemon.CronSchedule('*/15 8,17 * * *')
+
+    assert schedule.next_run(datetime.datetime(2020, 12, 25, 8, 16)) == datetime.datetime(2020, 12, 25, 8, 30)
+    assert schedule.next_run(datetime.datetime(2020, 12, 25, 8, 45)) == datetime.datetime(2020, 12, 25, 17, 0)
+
+
+def test_cron_schedule_day_of_week():
+    #: 2020-12-25 is a Friday
+    schedule = daemon.CronSchedule('30 6 * * 1-5')
+
+    assert schedule.next_run(datetime.datetime(2020, 12, 25, 7, 0)) == datetime.datetime(2020, 12, 28, 6, 30)
+    assert daemon.CronSchedule('0 0 * * 7').next_run(datetime.datetime(2020, 12, 25)) == datetime.datetime(
+        2020, 12, 27
+    )
+
+
+def test_cron_schedule_day_of_month_or_day_of_week():
+    schedule = daemon.CronSchedule('0 0 1 * 0')
+
+    assert schedule.matches(datetime.datetime(2021, 1, 1))  #: Friday, but the 1st
+    assert schedule.matches(datetime.datetime(2020, 12, 27))  #: Sunday
+    assert not schedule.matches(datetime.datetime(2020, 12, 28))
+
+
+def test_cron_schedule_leap_day():
+    schedule = daemon.CronSchedule('0 0 29 2 *')
+
+    assert schedule.next_run(datetime.datetime(2021, 1, 1)) == datetime.datetime(2024, 2, 29)
+
+
+@pytest.mark.parametrize('expression', ['* * * *', '60 * * * *', '* * 0 * *', '*/0 * * * *', '0 0 31 2 *'])
+def test_cron_schedule_invalid_expressions(expression):
+    with pytest.raises(ValueError):
+        daemon.CronSchedule(expression).next_run(datetime.datetime(2020, 1, 1))
+
+
+def test_run_daemon_runs_when_due_and_refreshes_while_idle(mocker):
+    times = iter([
+        datetime.datetime(2020, 12, 25, 1, 59),  #: initial next_run
+        datetime.datetime(2020, 12, 25, 1, 59),  #: not due yet
+        datetime.datetime(2020, 12, 25, 1, 59),  #: sleep calculation
+        datetime.datetime(2020, 12, 25, 2, 0),  #: due
+        datetime.datetime(2020, 12, 25, 2, 5),  #: after the run
+    ])
+    mocker.patch('reporter.daemon._now', side_effect=lambda: next(times))
+    sleep_mock = mocker.patch('reporter.daemon.time.sleep')
+    logger = mocker.Mock()
+    session = mocker.Mock()
+
+    def run(run_logger, run_session):
+        assert run_session is session
+        raise KeyboardInterrupt
+
+    with pytest.raises(KeyboardInterrupt):
+        daemon.run_daemon(logger, [daemon.CronSchedule('0 2 * * *')], session, run)
+
+    assert session.refresh.call_count == 2
+    sleep_mock.assert_called_once_with(60)
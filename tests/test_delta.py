@@ -0,0 +1,116 @@
+from reporter import delta, tools
+
+
+def _row(**values):
+    defaults = {
+        'itemid': 'foo',
+        'title': 'Foo',
+        'tags': 'tag1',
+        'sharing_everyone': 'True',
+        'sharing_org': 'True',
+        'sharing_groups': 'group',
+        'open_data_group': 'True',
+        'in_sgid': 'True',
+        'sizeMB': 10.0,
+        'views': 42,
+    }
+    defaults.update(values)
+    return tools.ItemInfoRow(**defaults)
+
+
+def test_compare_unchanged_rows_ignores_views():
+    previous = delta.item_fingerprints([_row()])
+    current = delta.item_fingerprints([_row(views=100)])
+
+    delta_rows, summary = delta.compare(previous, current)
+
+    assert delta_rows == []
+    assert set(summary.values()) == {0}
+
+
+def test_compare_new_and_removed_items():
+    previous = delta.item_fingerprints([_row(itemid='old')])
+    current = delta.item_fingerprints([_row(itemid='new')])
+
+    delta_rows, summary = delta.compare(previous, current)
+
+    assert [(row['itemid'], row['changes']) for row in delta_rows] == [('new', 'new'), ('old', 'removed')]
+    assert delta_rows[1]['previous_sizeMB'] == 10.0
+    assert summary['new'] == 1
+    assert summary['removed'] == 1
+
+
+def test_compare_size_jump_respects_threshold():
+    previous = delta.item_fingerprints([_row(itemid='small', sizeMB=10.0), _row(itemid='big', sizeMB=10.0)])
+    current = delta.item_fingerprints([_row(itemid='small', sizeMB=10.5), _row(itemid='big', sizeMB=12.0)])
+
+    delta_rows, summary = delta.compare(previous, current, size_threshold=0.1)
+
+    assert [(row['itemid'], row['changes']) for row in delta_rows] == [('big', 'size')]
+    assert summary['size'] == 1
+
+
+def test_compare_sharing_and_sgid_changes():
+    previous = delta.item_fingerprints([_row(), _row(itemid='bar', in_sgid='False')])
+    current = delta.item_fingerprints([_row(sharing_everyone='False', in_sgid='False'), _row(itemid='bar')])
+
+    delta_rows, summary = delta.compare(previous, current)
+
+    assert [(row['itemid'], row['changes']) for row in delta_rows] == [
+        ('foo', 'sharing, left_sgid'),
+        ('bar', 'joined_sgid'),
+    ]
+    assert summary['sharing'] == 1
+    assert summary['left_sgid'] == 1
+    assert summary['joined_sgid'] == 1
+
+
+def test_compare_unknown_sharing_is_not_a_sharing_change():
+    unknown_sharing = dict.fromkeys(delta.SHARING_COLUMNS)
+    stale = delta.item_fingerprints([_row(stale='True', **unknown_sharing)])
+    processed = delta.item_fingerprints([_row()])
+
+    assert delta.compare(processed, stale)[0] == []
+    assert delta.compare(stale, processed)[0] == []
+
+
+def test_compare_metadata_change():
+    previous = delta.item_fingerprints([_row()])
+    current = delta.item_fingerprints([_row(tags='tag1, tag2')])
+
+    delta_rows, _ = delta.compare(previous, current)
+
+    assert [(row['itemid'], row['changes']) for row in delta_rows] == [('foo', 'metadata')]
+
+
+def test_compare_ignores_modified_date():
+    previous = delta.item_fingerprints([_row(modified='2020-12-01 02:00:00')])
+    current = delta.item_fingerprints([_row(modified='2020-12-02 02:00:00')])
+
+    delta_rows, _ = delta.compare(previous, current)
+
+    assert delta_rows == []
+
+
+def test_fingerprints_ignore_columns_outside_metadata_columns():
+    row = _row()
+
+    assert delta.item_fingerprints([row]) == delta.item_fingerprints([dict(row.items(), new_column='foo')])
+
+
+def test_load_fingerprints_discards_old_format(tmp_path):
+    path = tmp_path / delta.FINGERPRINT_FILENAME
+    path.write_text('{"foo": ["hash", "hash", "Foo", 10.0, "True"]}')
+
+    assert delta.load_fingerprints(path) is None
+
+
+def test_save_and_load_fingerprints_round_trip(tmp_path):
+    fingerprints = delta.item_fingerprints([_row()])
+    path = tmp_path / delta.FINGERPRINT_FILENAME
+
+    assert delta.load_fingerprints(path) is None
+
+    delta.save_fingerprints(fingerprints, path)
+
+    assert delta.load_fingerprints(path) == fingerprints
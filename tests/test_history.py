@@ -0,0 +1,99 @@
+import sqlite3
+
+from reporter import history, tools
+
+
+def test_append_run_and_item_trend(tmp_path):
+    rows = [
+        tools.ItemInfoRow(itemid='foo', title='Foo', sizeMB=1.5, monthly_cost=0.5, data_requests_1Y=10),
+        tools.ItemInfoRow(itemid='bar', title='Bar', sizeMB=2.0, monthly_cost=1.0, data_requests_1Y='error'),
+    ]
+
+    with history.ReportHistory(tmp_path / 'history.sqlite3') as report_history:
+        report_history.append_run('2020-12-01 00:00:00', rows)
+        rows[0]['sizeMB'] = 3.0
+        report_history.append_run('2020-12-02 00:00:00', rows)
+
+        trend = report_history.item_trend('foo')
+
+    assert [(run[0], run[2]) for run in trend] == [('2020-12-01 00:00:00', 1.5), ('2020-12-02 00:00:00', 3.0)]
+
+
+def test_item_trend_since(tmp_path):
+    rows = [tools.ItemInfoRow(itemid='foo', sizeMB=1.5)]
+
+    with history.ReportHistory(tmp_path / 'history.sqlite3') as report_history:
+        report_history.append_run('2020-12-01 00:00:00', rows)
+        report_history.append_run('2020-12-02 00:00:00', rows)
+
+        trend = report_history.item_trend('foo', since='2020-12-02')
+
+    assert [run[0] for run in trend] == ['2020-12-02 00:00:00']
+
+
+def test_org_trend_sums_each_run_and_skips_usage_errors(tmp_path):
+    rows = [
+        {'itemid': 'foo', 'sizeMB': 1.5, 'monthly_credits': 1, 'monthly_cost': 0.5, 'data_requests_1Y': 10},
+        {'itemid': 'bar', 'sizeMB': 2.0, 'monthly_credits': 2, 'monthly_cost': 1.0, 'data_requests_1Y': 'error'},
+    ]
+
+    with history.ReportHistory(tmp_path / 'history.sqlite3') as report_history:
+        report_history.append_run('2020-12-01 00:00:00', rows)
+        report_history.append_run('2020-12-02 00:00:00', rows[:1])
+
+        trend = report_history.org_trend()
+        assert report_history.run_dates() == ['2020-12-01 00:00:00', '2020-12-02 00:00:00']
+
+    assert trend == [('2020-12-01 00:00:00', 2, 3.5, 3, 1.5, 10), ('2020-12-02 00:00:00', 1, 1.5, 1, 0.5, 10)]
+
+
+def test_format_table():
+    lines = history.format_table(('a', 'b'), [(1, None), ('x', 2.5)])
+
+    assert lines == ['a|b', '1|', 'x|2.5']
+
+
+def test_schema_adds_new_report_columns_to_existing_database(tmp_path):
+    db_path = tmp_path / 'history.sqlite3'
+    connection = sqlite3.connect(str(db_path))
+    connection.execute(
+        'CREATE TABLE item_history (run_date TEXT NOT NULL, itemid TEXT NOT NULL, title, '
+        'PRIMARY KEY (itemid, run_date)) WITHOUT ROWID'
+    )
+    connection.close()
+
+    with history.ReportHistory(db_path) as report_history:
+        report_history.append_run('2020-12-01 00:00:00', [tools.ItemInfoRow(itemid='foo', sizeMB=1.5)])
+
+        assert report_history.item_trend('foo')[0][2] == 1.5
+
+
+def test_latest_rows_returns_most_recent_row_per_item(tmp_path):
+    with history.ReportHistory(tmp_path / 'history.sqlite3') as report_history:
+        report_history.append_run('2020-12-01 00:00:00', [tools.ItemInfoRow(itemid='foo', sizeMB=1.0)])
+        report_history.append_run('2020-12-02 00:00:00', [tools.ItemInfoRow(itemid='foo', sizeMB=2.0)])
+        report_history.append_run('2020-12-02 00:00:00', [tools.ItemInfoRow(itemid='bar', sizeMB=3.0)])
+
+        latest_rows = report_history.latest_rows(['foo', 'baz'])
+
+    assert list(latest_rows) == ['foo']
+    assert latest_rows['foo']['sizeMB'] == 2.0
+
+
+def test_org_trend_summaries_are_created_for_existing_databases(tmp_path):
+    db_path = tmp_path / 'history.sqlite3'
+    with history.ReportHistory(db_path) as report_history:
+        report_history.append_run('2020-12-01 00:00:00', [tools.ItemInfoRow(itemid='foo', sizeMB=1.5)])
+        report_history.connection.execute('DROP TABLE run_summary')
+        report_history.connection.commit()
+
+    with history.ReportHistory(db_path) as report_history:
+        assert report_history.org_trend() == [('2020-12-01 00:00:00', 1, 1.5, None, None, None)]
+
+
+def test_org_trend_summary_updates_when_run_is_appended_again(tmp_path):
+    with history.ReportHistory(tmp_path / 'history.sqlite3') as report_history:
+        report_history.append_run('2020-12-01 00:00:00', [tools.ItemInfoRow(itemid='foo', sizeMB=1.5)])
+        report_history.append_run('2020-12-01 00:00:00', [tools.ItemInfoRow(itemid='bar', sizeMB=2.0)])
+
+        assert report_history.org_trend() == [('2020-12-01 00:00:00', 2, 3.5, None, None, None)]
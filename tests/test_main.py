@@ -0,0 +1,35 @@
+import types
+
+import pytest
+from reporter import credentials_template, main
+
+
+def test_main_rejects_unknown_report_names(mocker, capsys):
+    mocker.patch('reporter.registry.available_reports', return_value={'agol_usage': 'reporter.reports:AGOLUsageReport'})
+    run_reports_mock = mocker.patch('reporter.main.run_reports')
+
+    with pytest.raises(SystemExit) as exit_info:
+        main.main(['run', 'agol_usage', 'nope'])
+
+    assert exit_info.value.code == 2
+    assert 'unknown report(s): nope (available: agol_usage)' in capsys.readouterr().err
+    run_reports_mock.assert_not_called()
+
+
+def test_main_runs_named_reports(mocker):
+    mocker.patch('reporter.registry.available_reports', return_value={'agol_usage': 'reporter.reports:AGOLUsageReport'})
+    run_reports_mock = mocker.patch('reporter.main.run_reports')
+
+    assert main.main(['run', 'agol_usage']) == 0
+    assert run_reports_mock.call_args[1]['names'] == ['agol_usage']
+
+
+def test_run_daemon_with_old_credentials_uses_template_schedules(mocker):
+    mocker.patch('reporter.reports.credentials', types.SimpleNamespace(REPORT_DIR='reports'))
+    mocker.patch('reporter.main.load_reports', return_value=[])
+    daemon_mock = mocker.patch('reporter.daemon.run_daemon')
+
+    assert main.run_daemon(mocker.Mock()) == 0
+
+    schedules = daemon_mock.call_args[0][1]
+    assert [schedule.expression for schedule in schedules] == credentials_template.DAEMON_SCHEDULES
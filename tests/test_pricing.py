@@ -0,0 +1,39 @@
+from reporter import pricing, tools
+
+
+def test_apply_pricing_uses_rate_for_each_type():
+    rows = [
+        tools.ItemInfoRow(itemid='foo', type='Feature Service', sizeMB=10.0),
+        tools.ItemInfoRow(itemid='bar', type='Vector Tile Service', sizeMB=100.0),
+    ]
+    credits_per_mb = {'Feature Service': 0.24, 'Vector Tile Service': 0.001}
+
+    pricing.apply_pricing(rows, credits_per_mb, 0.1)
+
+    assert rows[0]['monthly_credits'] == 10.0 * 0.24
+    assert rows[0]['monthly_cost'] == 10.0 * 0.24 * 0.1
+    assert rows[1]['monthly_credits'] == 100.0 * 0.001
+    assert rows[1]['monthly_cost'] == 100.0 * 0.001 * 0.1
+
+
+def test_apply_pricing_unknown_type_uses_default_rate():
+    rows = [{'type': 'Web Map', 'sizeMB': 2.0}, {'type': 'Notebook', 'sizeMB': 2.0}]
+
+    pricing.apply_pricing(rows, {'Feature Service': 0.24}, 0.1)
+    assert rows[0]['monthly_credits'] == 0
+
+    pricing.apply_pricing(rows, {'Feature Service': 0.24}, 0.1, default_credits_per_mb=0.5)
+    assert rows[1]['monthly_credits'] == 1.0
+
+
+def test_apply_pricing_missing_size_is_zero():
+    rows = [{'type': 'Feature Service', 'sizeMB': None}]
+
+    pricing.apply_pricing(rows, {'Feature Service': 0.24}, 0.1)
+
+    assert rows[0]['monthly_credits'] == 0
+    assert rows[0]['monthly_cost'] == 0
+
+
+def test_apply_pricing_empty_inventory():
+    assert pricing.apply_pricing([], {'Feature Service': 0.24}, 0.1) == []
@@ -0,0 +1,34 @@
+import pytest
+from reporter import registry, reports
+
+
+class LightReport(reports.Report):
+    dependencies = ('json',)
+
+
+def test_load_report_imports_class_and_dependencies(mocker):
+    import_mock = mocker.patch('reporter.registry.importlib.import_module', wraps=registry.importlib.import_module)
+
+    report_class = registry.load_report('light', {'light': f'{__name__}:LightReport'})
+
+    assert report_class.__name__ == 'LightReport'
+    assert [call[0][0] for call in import_mock.call_args_list] == [__name__, 'json']
+
+
+def test_load_report_unknown_name():
+    with pytest.raises(KeyError):
+        registry.load_report('nope', {'light': f'{__name__}:LightReport'})
+
+
+def test_available_reports_includes_built_ins_and_entry_points(mocker):
+    mocker.patch('reporter.registry._entry_point_reports', return_value={'plugin': 'plugin.module:PluginReport'})
+
+    available = registry.available_reports()
+
+    assert available['plugin'] == 'plugin.module:PluginReport'
+    assert available['agol_usage'] == 'reporter.reports:AGOLUsageReport'
+
+
+def test_agol_usage_report_declares_arcgis_dependencies():
+    assert set(reports.AGOLUsageReport.dependencies) == {'arcgis', 'arcpy'}
+    assert reports.AGOLUsageReport.uses_agol_session
@@ -1,4 +1,8 @@
-from reporter import report_writers
+import gzip
+from pathlib import Path
+
+import pytest
+from reporter import report_writers, tools
 
 
 def test_list_of_dicts_to_csv_gets_columns_right(mocker, tmp_path):
@@ -25,3 +29,101 @@ def test_list_of_dicts_to_rotating_logger_correct_output(mocker, tmp_path):
 
     content = out_path.read_text()
     assert content == 'foo_date\nfoo|bar\n1|2\n3|4\n'
+
+
+def test_list_of_dicts_to_csv_accepts_item_info_rows(mocker, tmp_path):
+    test_data = [tools.ItemInfoRow(itemid='foo', title='bar'), tools.ItemInfoRow(itemid='baz', views=4)]
+    out_path = tmp_path / 'test.csv'
+
+    mock_datetime = mocker.patch('datetime.datetime')
+    mock_datetime.now.return_value.strftime.return_value = 'foo_date'
+
+    report_writers.list_of_dicts_to_csv(test_data, out_path)
+
+    lines = out_path.read_text().splitlines()
+    assert lines[1] == ','.join(tools.ITEM_INFO_COLUMNS)
+    assert lines[2].startswith('foo,bar,,')
+    assert lines[3].startswith('baz,,,,4,')
+
+
+def test_list_of_dicts_to_rotating_logger_rotates_previous_reports(mocker, tmp_path):
+    out_path = tmp_path / 'test.csv'
+
+    mock_datetime = mocker.patch('datetime.datetime')
+    mock_datetime.now.return_value.strftime.return_value = 'foo_date'
+
+    for value in range(4):
+        report_writers.list_of_dicts_to_rotating_logger([{'foo': value}], out_path, rotate_count=2)
+
+    assert out_path.read_text() == 'foo_date\nfoo\n3\n'
+    assert (tmp_path / 'test.csv.1').read_text() == 'foo_date\nfoo\n2\n'
+    assert (tmp_path / 'test.csv.2').read_text() == 'foo_date\nfoo\n1\n'
+    assert sorted(path.name for path in tmp_path.iterdir()) == ['test.csv', 'test.csv.1', 'test.csv.2']
+
+
+def test_list_of_dicts_to_csv_gzip(mocker, tmp_path):
+    test_data = [{'foo': 1, 'bar': 2}, {'bar': 4, 'foo': 3}]
+
+    mock_datetime = mocker.patch('datetime.datetime')
+    mock_datetime.now.return_value.strftime.return_value = 'foo_date'
+
+    out_path = report_writers.list_of_dicts_to_csv(test_data, tmp_path / 'test.csv', compression='gzip', fsync=True)
+
+    assert out_path == tmp_path / 'test.csv.gz'
+    assert gzip.decompress(out_path.read_bytes()) == b'foo_date,\r\nfoo,bar\r\n1,2\r\n3,4\r\n'
+    assert [path.name for path in tmp_path.iterdir()] == ['test.csv.gz']
+    #: The FNAME flag isn't set, so the temporary file's name isn't in the header
+    assert not out_path.read_bytes()[3] & gzip.FNAME
+    assert b'.tmp' not in out_path.read_bytes()[:64]
+
+
+def test_list_of_dicts_to_rotating_logger_gzip(mocker, tmp_path):
+    mock_datetime = mocker.patch('datetime.datetime')
+    mock_datetime.now.return_value.strftime.return_value = 'foo_date'
+
+    report_writers.list_of_dicts_to_rotating_logger([{'foo': 1}], tmp_path / 'test.csv', compression='gzip')
+    out_path = report_writers.list_of_dicts_to_rotating_logger([{'foo': 2}], tmp_path / 'test.csv', compression='gzip')
+
+    assert out_path == tmp_path / 'test.csv.gz'
+    assert gzip.decompress(out_path.read_bytes()) == b'foo_date\nfoo\n2\n'
+    assert gzip.decompress((tmp_path / 'test.csv.gz.1').read_bytes()) == b'foo_date\nfoo\n1\n'
+
+
+def test_atomic_text_writer_leaves_existing_file_on_error(tmp_path):
+    out_path = tmp_path / 'test.csv'
+    out_path.write_text('good report')
+
+    with pytest.raises(RuntimeError):
+        with report_writers.atomic_text_writer(out_path) as out_file:
+            out_file.write('half a report')
+            raise RuntimeError('crash')
+
+    assert out_path.read_text() == 'good report'
+    assert [path.name for path in tmp_path.iterdir()] == ['test.csv']
+
+
+def test_atomic_text_writer_closes_compressed_stream_on_error(tmp_path):
+    with pytest.raises(RuntimeError):
+        with report_writers.atomic_text_writer(tmp_path / 'test.csv.gz', 'gzip') as out_file:
+            out_file.write('half a report')
+            raise RuntimeError('crash')
+
+    assert out_file.closed
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_list_of_dicts_to_rotating_logger_fsyncs_directory(mocker, tmp_path):
+    fsync_directory_mock = mocker.patch('reporter.report_writers._fsync_directory')
+
+    out_path = report_writers.list_of_dicts_to_rotating_logger([{'foo': 1}], tmp_path / 'test.csv', fsync=True)
+
+    fsync_directory_mock.assert_called_with(out_path.parent)
+
+
+def test_compressed_path():
+    assert report_writers.compressed_path(Path('test.csv')) == Path('test.csv')
+    assert report_writers.compressed_path(Path('test.csv'), 'zstd') == Path('test.csv.zst')
+    assert report_writers.compressed_path(Path('test.csv.gz'), 'gzip') == Path('test.csv.gz')
+
+    with pytest.raises(ValueError):
+        report_writers.compressed_path(Path('test.csv'), 'rar')
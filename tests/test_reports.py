@@ -1,16 +1,36 @@
-from reporter import reports
+import datetime
+import types
+
+from reporter import credentials_template, history, reports, tools
+
+
+def _old_credentials():
+    #: A credentials.py copied from the template before any of the newer settings were added
+    return types.SimpleNamespace(
+        ORG='https://example.maps.arcgis.com',
+        USERNAME='user',
+        PASSWORD='password',
+        SGID_METATABLE='sgid_table',
+        AGOL_METATABLE='agol_table',
+        HFS_CREDITS_PER_MB=0.5,
+        DOLLARS_PER_CREDIT=0.1,
+        REPORT_DIR='reports',
+    )
 
 # def test_AGOL_create_report_itemid_not_in_metatable()
 
 
 def test_AGOL_create_report_call_with_metatable_info(mocker):
     mock_object = mocker.Mock()
+    mock_object.session = None
+    mock_object.time_budget_minutes = None
+    mocker.patch.dict('sys.modules', {'arcpy': mocker.Mock()})
 
     mock_org = mocker.patch('reporter.tools.Organization')
     item = mocker.Mock()
     item.itemid = 'foo'
     mock_org.get_feature_services_in_folders.return_value = [(item, 'folder1')]
-    mock_org.get_open_data_groups.return_value = ['Open Data Group']
+    mock_org.get_open_data_groups.return_value = {'open_data_id': 'Open Data Group'}
 
     mock_metatable = mocker.patch('reporter.tools.Metatable')
     mock_row = mocker.Mock()
@@ -19,17 +39,20 @@ def test_AGOL_create_report_call_with_metatable_info(mocker):
 
     reports.AGOLUsageReport.create_report(mock_object)
 
-    assert mock_org.get_item_info.called_with(item, ['Open Data Group'], 'folder1', 'Test Category')
+    assert mock_org.get_item_info.called_with(item, {'open_data_id': 'Open Data Group'}, 'folder1', 'Test Category')
 
 
 def test_AGOL_create_report_call_without_metatable_info(mocker):
     mock_object = mocker.Mock()
+    mock_object.session = None
+    mock_object.time_budget_minutes = None
+    mocker.patch.dict('sys.modules', {'arcpy': mocker.Mock()})
 
     mock_org = mocker.patch('reporter.tools.Organization')
     item = mocker.Mock()
     item.itemid = 'foo'
     mock_org.get_feature_services_in_folders.return_value = [(item, 'folder1')]
-    mock_org.get_open_data_groups.return_value = ['Open Data Group']
+    mock_org.get_open_data_groups.return_value = {'open_data_id': 'Open Data Group'}
 
     mock_metatable = mocker.patch('reporter.tools.Metatable')
     mock_row = mocker.Mock()
@@ -38,4 +61,156 @@ def test_AGOL_create_report_call_without_metatable_info(mocker):
 
     reports.AGOLUsageReport.create_report(mock_object)
 
-    assert mock_org.get_item_info.called_with(item, ['Open Data Group'], 'folder1', None)
+    assert mock_org.get_item_info.called_with(item, {'open_data_id': 'Open Data Group'}, 'folder1', None)
+
+
+def test_save_report_writes_data_with_each_writer(mocker, tmp_path):
+    writer_mock = mocker.Mock(return_value=tmp_path / 'Report_foo.csv')
+    report = reports.Report(mocker.Mock(), tmp_path / 'Report_foo.csv')
+    report.writers = (writer_mock, writer_mock)
+
+    report.save_report([{'foo': 1}])
+
+    assert writer_mock.call_count == 2
+    writer_mock.assert_called_with(
+        [{'foo': 1}], tmp_path / 'Report_foo.csv', compression=None, compression_level=None, fsync=False
+    )
+
+
+def test_AGOL_save_report_appends_to_history(mocker, tmp_path):
+    report = reports.AGOLUsageReport(
+        mocker.Mock(), tmp_path / 'AGOLReport_foo.csv', run_time=datetime.datetime(2020, 12, 1, 2, 0, 5)
+    )
+
+    data = [tools.ItemInfoRow(itemid='foo', sizeMB=1.5)]
+
+    report.save_report(data)
+
+    assert report.out_path.exists()
+    with history.ReportHistory(tmp_path / history.HISTORY_FILENAME) as report_history:
+        assert report_history.item_trend('foo') == [('2020-12-01 02:00:05', None, 1.5, None, None, None, None)]
+
+
+def test_AGOL_from_credentials_uses_run_timestamp_for_path_and_history(mocker):
+    timestamp = datetime.datetime(2020, 12, 1, 2, 0, 5)
+
+    report = reports.AGOLUsageReport.from_credentials(mocker.Mock(), timestamp)
+
+    assert report.out_path.name == 'AGOLReport_20201201-020005.csv'
+    assert report.run_time is timestamp
+
+
+def test_AGOL_save_delta_report_writes_changed_rows(mocker, tmp_path):
+    mock_object = mocker.Mock()
+    mock_object.out_path = tmp_path / 'AGOLReport_foo.csv'
+
+    reports.AGOLUsageReport.save_delta_report(mock_object, [tools.ItemInfoRow(itemid='foo', sizeMB=1.5)])
+    assert not (tmp_path / 'AGOLDelta_foo.csv').exists()
+
+    reports.AGOLUsageReport.save_delta_report(mock_object, [tools.ItemInfoRow(itemid='bar', sizeMB=1.5)])
+    assert (tmp_path / 'AGOLDelta_foo.csv').exists()
+
+
+def _mock_session(mocker, items):
+    session = mocker.Mock()
+    session.organization.get_feature_services_in_folders.return_value = items
+    session.organization.get_item_info.side_effect = lambda item, groups, folder, category: tools.ItemInfoRow(
+        itemid=item.itemid, type=item.type, sizeMB=item.size
+    )
+    session.organization.get_stale_item_info.side_effect = lambda item, folder, category, cached: tools.ItemInfoRow(
+        itemid=item.itemid, type=item.type, sizeMB=item.size, stale='True', data_requests_1Y=(cached or {}).get(
+            'data_requests_1Y'
+        )
+    )
+    session.metatable = tools.Metatable(mocker.Mock())
+
+    return session
+
+
+def _mock_item(mocker, itemid, size):
+    item = mocker.Mock()
+    item.itemid = itemid
+    item.type = 'Feature Service'
+    item.size = size
+
+    return item
+
+
+def test_AGOL_create_report_processes_largest_items_first_in_original_order(mocker, tmp_path):
+    items = [(_mock_item(mocker, 'small', 1), None), (_mock_item(mocker, 'big', 100), None)]
+    session = _mock_session(mocker, items)
+
+    report = reports.AGOLUsageReport(mocker.Mock(), tmp_path / 'AGOLReport_foo.csv', session)
+    rows = report.create_report()
+
+    processed = [call[0][0].itemid for call in session.organization.get_item_info.call_args_list]
+    assert processed == ['big', 'small']
+    assert [row['itemid'] for row in rows] == ['small', 'big']
+
+
+def test_AGOL_create_report_inventories_and_prices_every_priced_type(mocker, tmp_path):
+    tile = _mock_item(mocker, 'tile', 1024 * 1024)
+    tile.type = 'Vector Tile Service'
+    session = _mock_session(mocker, [(tile, None)])
+    mocker.patch('reporter.reports.credentials.ITEM_TYPE_CREDITS_PER_MB', {'Vector Tile Service': 0.5})
+    mocker.patch('reporter.reports.credentials.DOLLARS_PER_CREDIT', 0.1)
+
+    report = reports.AGOLUsageReport(mocker.Mock(), tmp_path / 'AGOLReport_foo.csv', session)
+    rows = report.create_report()
+
+    session.organization.get_feature_services_in_folders.assert_called_once_with(
+        mocker.ANY, {'Vector Tile Service': 0.5}
+    )
+    assert rows[0]['monthly_credits'] == 1024 * 1024 * 0.5
+    assert rows[0]['monthly_cost'] == 1024 * 1024 * 0.5 * 0.1
+
+
+def test_AGOL_create_report_out_of_time_uses_history(mocker, tmp_path):
+    with history.ReportHistory(tmp_path / history.HISTORY_FILENAME) as report_history:
+        report_history.append_run('2020-12-01 00:00:00', [tools.ItemInfoRow(itemid='small', data_requests_1Y=42)])
+
+    items = [(_mock_item(mocker, 'small', 1), None), (_mock_item(mocker, 'big', 100), None)]
+    session = _mock_session(mocker, items)
+    monotonic_mock = mocker.patch('reporter.reports.monotonic')
+    monotonic_mock.side_effect = [0, 0, 60]  #: deadline calculation, before 'big', before 'small'
+
+    report = reports.AGOLUsageReport(mocker.Mock(), tmp_path / 'AGOLReport_foo.csv', session, time_budget_minutes=1)
+    rows = report.create_report()
+
+    assert [row['itemid'] for row in rows] == ['small', 'big']
+    assert rows[0]['stale'] == 'True'
+    assert rows[0]['data_requests_1Y'] == 42
+    assert rows[0]['monthly_credits'] == 1 * reports.credentials.HFS_CREDITS_PER_MB
+    assert rows[1]['stale'] is None
+    session.organization.get_item_info.assert_called_once()
+
+
+def test_AGOL_create_report_joins_metatable_categories(mocker, tmp_path):
+    items = [(_mock_item(mocker, 'small', 1), None), (_mock_item(mocker, 'big', 100), None)]
+    session = _mock_session(mocker, items)
+    session.metatable.metatable_dict = {'small': tools.MetatableRow('SGID.TEST.Small', 'Small', 'SGID', 'y')}
+
+    report = reports.AGOLUsageReport(mocker.Mock(), tmp_path / 'AGOLReport_foo.csv', session)
+    report.create_report()
+
+    categories = {call[0][0].itemid: call[0][3] for call in session.organization.get_item_info.call_args_list}
+    assert categories == {'small': 'SGID', 'big': None}
+
+
+def test_old_credentials_file_falls_back_to_template_settings(mocker):
+    mocker.patch('reporter.reports.credentials', _old_credentials())
+    session_mock = mocker.patch('reporter.tools.AGOLSession')
+
+    report = reports.AGOLUsageReport.from_credentials(mocker.Mock(), datetime.datetime(2020, 12, 1))
+    reports.create_agol_session(mocker.Mock())
+
+    assert report.time_budget_minutes == credentials_template.AGOL_TIME_BUDGET_MINUTES
+    assert reports._writer_options() == {'compression': None, 'compression_level': None, 'fsync': False}
+    assert session_mock.call_args[1]['group_cache_hours'] == credentials_template.GROUP_CACHE_HOURS
+    assert session_mock.call_args[1]['http_options'] == {
+        'pool_size': credentials_template.AGOL_HTTP_POOL_SIZE,
+        'timeout': credentials_template.AGOL_HTTP_TIMEOUT,
+    }
+    #: The old feature service rate still prices feature services
+    assert reports._credits_per_mb()['Feature Service'] == 0.5
+    assert reports._credits_per_mb()['Notebook'] == credentials_template.FILE_STORAGE_CREDITS_PER_MB
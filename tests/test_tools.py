@@ -3,15 +3,11 @@
 """
 
 import datetime
+import tracemalloc
 
 import pytest
 from reporter import tools
 
-try:
-    from reporter import credentials
-except (ModuleNotFoundError, ImportError):
-    from reporter import credentials_template as credentials
-
 
 @pytest.fixture(scope='function')
 def item(mocker):
@@ -21,12 +17,15 @@ def item(mocker):
 
     group1_mock = mocker.Mock()
     group1_mock.title = 'TestSGIDGroup'
+    group1_mock.id = 'sgid_group_id'
     group2_mock = mocker.Mock()
     group2_mock.title = 'test_group'
+    group2_mock.id = 'test_group_id'
 
     item = mocker.Mock()
     item.itemid = 'itemid'
     item.title = 'title'
+    item.type = 'Feature Service'
     item.owner = 'owner'
     item.numViews = 42
     test_date = datetime.datetime(2020, 12, 25, 18, 30, 55)
@@ -59,12 +58,13 @@ def test_get_item_info_correct_values(mocker, item):
     org_mock = mocker.Mock()
 
     folder = 'folder'
-    open_data_groups = ['TestSGIDGroup']
+    open_data_groups = {'sgid_group_id': 'TestSGIDGroup'}
     category = 'SGID'
 
     test_dict = tools.Organization.get_item_info(org_mock, item, open_data_groups, folder, category)
     assert test_dict['itemid'] == 'itemid'
     assert test_dict['title'] == 'title'
+    assert test_dict['type'] == 'Feature Service'
     assert test_dict['owner'] == 'owner'
     assert test_dict['folder'] == 'folder'
     assert test_dict['views'] == 42
@@ -77,9 +77,10 @@ def test_get_item_info_correct_values(mocker, item):
     assert test_dict['in_sgid'] == 'True'
     assert test_dict['tags'] == 'tag1, tag2'
     assert test_dict['sizeMB'] == 12
-    assert test_dict['monthly_credits'] == 12 * credentials.HFS_CREDITS_PER_MB
-    assert test_dict['monthly_cost'] == 12 * credentials.HFS_CREDITS_PER_MB * credentials.DOLLARS_PER_CREDIT
+    assert test_dict['monthly_credits'] is None
+    assert test_dict['monthly_cost'] is None
     assert test_dict['data_requests_1Y'] == 1234
+    assert test_dict['stale'] == 'False'
 
 
 def test_get_item_info_not_open_data(mocker, item):
@@ -87,9 +88,10 @@ def test_get_item_info_not_open_data(mocker, item):
 
     group_mock = mocker.Mock()
     group_mock.title = 'test_group'
+    group_mock.id = 'test_group_id'
     item.shared_with = {'everyone': True, 'org': True, 'groups': [group_mock]}
 
-    open_data_groups = ['TestSGIDGroup']
+    open_data_groups = {'sgid_group_id': 'TestSGIDGroup'}
     category = 'SGID'
 
     test_dict = tools.Organization.get_item_info(org_mock, item, open_data_groups, 'folder', category)
@@ -100,7 +102,7 @@ def test_get_item_info_not_open_data(mocker, item):
 def test_get_item_info_shelved_data_not_in_sgid(mocker, item):
     org_mock = mocker.Mock()
 
-    open_data_groups = ['TestSGIDGroup']
+    open_data_groups = {'sgid_group_id': 'TestSGIDGroup'}
 
     category = 'shelved'
 
@@ -112,7 +114,7 @@ def test_get_item_info_shelved_data_not_in_sgid(mocker, item):
 def test_get_item_info_static_data_in_sgid(mocker, item):
     org_mock = mocker.Mock()
 
-    open_data_groups = ['TestSGIDGroup']
+    open_data_groups = {'sgid_group_id': 'TestSGIDGroup'}
 
     category = 'static'
 
@@ -125,7 +127,7 @@ def test_get_item_info_root_folder(mocker, item):
     org_mock = mocker.Mock()
 
     folder = None
-    open_data_groups = ['Foo']
+    open_data_groups = {'foo_id': 'Foo'}
     category = 'static'
 
     test_dict = tools.Organization.get_item_info(org_mock, item, open_data_groups, folder, category)
@@ -137,7 +139,7 @@ def test_get_item_info_sharing_error(mocker, item):
     org_mock = mocker.Mock()
 
     folder = 'Foo'
-    open_data_groups = ['Foo']
+    open_data_groups = {'foo_id': 'Foo'}
     category = 'static'
 
     _retry_mock = mocker.patch('reporter.tools.retry')
@@ -158,7 +160,7 @@ def test_get_item_info_usage_error(mocker, item):
     org_mock = mocker.Mock()
 
     folder = 'Foo'
-    open_data_groups = ['Foo']
+    open_data_groups = {'foo_id': 'Foo'}
     category = 'static'
 
     _retry_mock = mocker.patch('reporter.tools.retry')
@@ -177,11 +179,13 @@ def test_get_sharing_valid_data(item):
     assert sharing[0] == 'True'
     assert sharing[1] == 'True'
     assert sharing[2] == 'TestSGIDGroup, test_group'
+    assert sharing[3] == {'sgid_group_id', 'test_group_id'}
 
 
 def test_get_open_data_groups_open_data_True(mocker):
 
-    group_mock = mocker.Mock(spec=['isOpenData', 'title'], name='group mock')
+    group_mock = mocker.Mock(spec=['id', 'isOpenData', 'title'], name='group mock')
+    group_mock.id = 'open_data_id'
     group_mock.isOpenData = True
     group_mock.title = 'OpenDataGroup'
 
@@ -191,12 +195,13 @@ def test_get_open_data_groups_open_data_True(mocker):
 
     open_data_groups = tools.Organization.get_open_data_groups(gis_mock)
 
-    assert open_data_groups == ['OpenDataGroup']
+    assert open_data_groups == {'open_data_id': 'OpenDataGroup'}
 
 
 def test_get_open_data_groups_open_data_False(mocker):
 
-    group_mock = mocker.Mock(spec=['isOpenData', 'title'], name='group mock')
+    group_mock = mocker.Mock(spec=['id', 'isOpenData', 'title'], name='group mock')
+    group_mock.id = 'private_id'
     group_mock.isOpenData = False
     group_mock.title = 'PrivateGroup'
 
@@ -206,7 +211,72 @@ def test_get_open_data_groups_open_data_False(mocker):
 
     open_data_groups = tools.Organization.get_open_data_groups(gis_mock)
 
-    assert open_data_groups == []
+    assert open_data_groups == {}
+
+
+def test_get_open_data_groups_matches_ids_not_titles(mocker, item):
+    org_mock = mocker.Mock()
+
+    #: Same title as one of the item's groups, but a different group
+    open_data_groups = {'other_group_id': 'TestSGIDGroup'}
+
+    test_dict = tools.Organization.get_item_info(org_mock, item, open_data_groups, 'folder', 'SGID')
+
+    assert test_dict['open_data_group'] == 'False'
+
+
+def test_get_open_data_groups_writes_and_uses_cache(mocker, tmp_path):
+    group_mock = mocker.Mock(spec=['id', 'isOpenData', 'title'], name='group mock')
+    group_mock.id = 'open_data_id'
+    group_mock.isOpenData = True
+    group_mock.title = 'OpenDataGroup'
+
+    gis_mock = mocker.Mock(name='gis mock')
+    gis_mock.gis.groups.search.return_value = [group_mock]
+    cache_path = tmp_path / 'groups.json'
+
+    first = tools.Organization.get_open_data_groups(gis_mock, cache_path)
+    second = tools.Organization.get_open_data_groups(gis_mock, cache_path)
+
+    assert first == second == {'open_data_id': 'OpenDataGroup'}
+    gis_mock.gis.groups.search.assert_called_once()
+
+
+def test_get_open_data_groups_expired_cache_searches_again(mocker, tmp_path):
+    cache_path = tmp_path / 'groups.json'
+    cache_path.write_text(
+        '{"cached_at": 0, "groups": {"old_id": {"title": "Old", "isOpenData": true}}}', encoding='utf-8'
+    )
+
+    gis_mock = mocker.Mock(name='gis mock')
+    gis_mock.gis.groups.search.return_value = []
+
+    open_data_groups = tools.Organization.get_open_data_groups(gis_mock, cache_path, max_cache_hours=24)
+
+    assert open_data_groups == {}
+    gis_mock.gis.groups.search.assert_called_once()
+
+
+@pytest.mark.parametrize(
+    'cache_text', [
+        '[]',
+        '{"cached_at": "yesterday", "groups": {}}',
+        '{"cached_at": 0}',
+        '{"cached_at": <now>, "groups": {"x": 1}}',
+        '{"cached_at": <now>, "groups": {"x": {"title": "X"}}}',
+    ]
+)
+def test_get_open_data_groups_malformed_cache_searches_again(mocker, tmp_path, cache_text):
+    cache_path = tmp_path / 'groups.json'
+    cache_path.write_text(cache_text.replace('<now>', str(datetime.datetime.now().timestamp())), encoding='utf-8')
+
+    gis_mock = mocker.Mock(name='gis mock')
+    gis_mock.gis.groups.search.return_value = []
+
+    open_data_groups = tools.Organization.get_open_data_groups(gis_mock, cache_path, max_cache_hours=None)
+
+    assert open_data_groups == {}
+    gis_mock.gis.groups.search.assert_called_once()
 
 
 def test_get_feature_services_in_folders_one_item(mocker):
@@ -239,6 +309,27 @@ def test_get_feature_services_in_folders_empty_for_no_feature_services(mocker):
     assert items_folders == []
 
 
+def test_get_feature_services_in_folders_includes_other_item_types(mocker):
+
+    folders = ['folder']
+
+    feature_service_mock = mocker.Mock()
+    feature_service_mock.type = 'Feature Service'
+    tile_mock = mocker.Mock()
+    tile_mock.type = 'Vector Tile Service'
+    web_map_mock = mocker.Mock()
+    web_map_mock.type = 'Web Map'
+
+    org_mock = mocker.Mock()
+    org_mock.user_item.items.return_value = [feature_service_mock, tile_mock, web_map_mock]
+
+    items_folders = tools.Organization.get_feature_services_in_folders(
+        org_mock, folders, {'Feature Service': 0.24, 'Vector Tile Service': 0.001}
+    )
+
+    assert items_folders == [(feature_service_mock, 'folder'), (tile_mock, 'folder')]
+
+
 def test_get_users_folders(mocker):
     fake_folder = {'title': 'test folder'}
 
@@ -273,6 +364,18 @@ def test_retry_calls_method_four_times(mocker):
     assert worker_mock.call_count == 4
 
 
+def test_retry_logs_instead_of_printing_and_returns_the_retried_result(mocker, capsys):
+    mocker.patch('reporter.tools.sleep')
+    logger_mock = mocker.Mock()
+
+    worker_mock = mocker.Mock()
+    worker_mock.side_effect = [Exception('flaky'), 'result']
+
+    assert tools.retry(worker_mock, logger=logger_mock) == 'result'
+    logger_mock.warning.assert_called_once()
+    assert capsys.readouterr().out == ''
+
+
 def test_read_sgid_metatable_to_dictionary(mocker):
 
     def return_sgid_row(self, table, fields):
@@ -351,3 +454,210 @@ def test_read_metatable_handles_duplicate_rows(mocker):
 
     assert test_table.metatable_dict['11112222333344445555666677778888'] == ('table name', 'agol title', 'shelved', 'n')
     assert test_table.duplicate_keys == ['11112222333344445555666677778888']
+
+
+def test_item_info_row_keys_in_column_order():
+    row = tools.ItemInfoRow(title='title', itemid='itemid')
+
+    assert row.keys() == list(tools.ITEM_INFO_COLUMNS)
+    assert row['itemid'] == 'itemid'
+    assert row['title'] == 'title'
+    assert row['owner'] is None
+
+
+def test_item_info_row_rejects_unknown_columns():
+    row = tools.ItemInfoRow()
+
+    with pytest.raises(KeyError):
+        row['foo'] = 'bar'
+
+    with pytest.raises(KeyError):
+        row['foo']  # pylint: disable=pointless-statement
+
+    with pytest.raises(KeyError):
+        tools.ItemInfoRow(foo='bar')
+
+
+def test_item_info_row_has_no_instance_dict():
+    row = tools.ItemInfoRow()
+
+    assert not hasattr(row, '__dict__')
+
+
+def test_item_info_row_rejects_methods_as_columns():
+    with pytest.raises(KeyError):
+        tools.ItemInfoRow()['keys']  # pylint: disable=expression-not-assigned
+
+
+def test_item_info_rows_use_less_memory_than_dicts_for_50k_items():
+
+    def peak_memory(make_row):
+        tracemalloc.start()
+        try:
+            rows = [make_row(itemid=f'{index:032x}', title=f'Layer {index}', sizeMB=index) for index in range(50000)]
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+        assert len(rows) == 50000
+        return peak
+
+    row_peak = peak_memory(tools.ItemInfoRow)
+    dict_peak = peak_memory(lambda **values: tools.ItemInfoRow(**values).as_dict())
+
+    assert row_peak < dict_peak * 0.6
+
+
+def test_get_item_info_returns_item_info_row(mocker, item):
+    org_mock = mocker.Mock()
+
+    test_row = tools.Organization.get_item_info(org_mock, item, {'sgid_group_id': 'TestSGIDGroup'}, 'folder', 'SGID')
+
+    assert isinstance(test_row, tools.ItemInfoRow)
+    assert test_row.keys() == list(tools.ITEM_INFO_COLUMNS)
+
+
+def test_read_metatable_handles_duplicates_across_batches_and_tables(mocker):
+    good_id = '11112222333344445555666677778888'
+    other_id = '99998888777766665555444433332222'
+
+    def return_rows(self, table, fields):
+        if table == 'sgid':
+            yield from [
+                ['first', good_id, 'agol title', 'y'],
+                ['skipped', 'not in agol', 'agol title', 'y'],
+                ['second', good_id, 'agol title', 'y'],
+                ['other', other_id, 'other title', 'n'],
+            ]
+        else:
+            yield ['shelved', other_id, 'other title', 'shelved']
+
+    mocker.patch('reporter.tools.Metatable._cursor_wrapper', return_rows)
+
+    test_table = tools.Metatable(mocker.Mock())
+    test_table.batch_size = 2
+    test_table.read_metatable('sgid', ['TABLENAME', 'AGOL_ITEM_ID', 'AGOL_PUBLISHED_NAME', 'Authoritative'])
+    test_table.read_metatable('agol', ['TABLENAME', 'AGOL_ITEM_ID', 'AGOL_PUBLISHED_NAME', 'CATEGORY'])
+
+    assert test_table.metatable_dict == {
+        good_id: ('first', 'agol title', 'SGID', 'y'),
+        other_id: ('other', 'other title', 'SGID', 'n'),
+    }
+    assert test_table.duplicate_keys == [good_id, other_id]
+
+
+def test_read_metatable_lists_duplicate_keys_in_row_order(mocker):
+    first_id = '11112222333344445555666677778888'
+    second_id = '99998888777766665555444433332222'
+
+    def return_rows(self, table, fields):
+        for itemid in [first_id, second_id, second_id, first_id, first_id]:
+            yield ['table name', itemid, 'agol title', 'shelved']
+
+    mocker.patch('reporter.tools.Metatable._cursor_wrapper', return_rows)
+
+    test_table = tools.Metatable(mocker.Mock())
+    test_table.read_metatable('something', ['TABLENAME', 'AGOL_ITEM_ID', 'AGOL_PUBLISHED_NAME', 'CATEGORY'])
+
+    assert test_table.duplicate_keys == [second_id, first_id, first_id]
+
+
+def test_metatable_categories_for_joins_in_order(mocker):
+    test_table = tools.Metatable(mocker.Mock())
+    test_table.metatable_dict = {'foo': tools.MetatableRow('sgid', 'agol', 'shelved', 'n')}
+
+    assert test_table.categories_for(['bar', 'foo', 'bar']) == [None, 'shelved', None]
+
+
+def test_agol_session_signs_in_and_loads_lookups_once(mocker):
+    arcpy_mock = mocker.Mock()
+    mocker.patch.dict('sys.modules', {'arcpy': arcpy_mock})
+    organization_mock = mocker.patch('reporter.tools.Organization')
+    metatable_mock = mocker.patch('reporter.tools.Metatable')
+
+    session = tools.AGOLSession(mocker.Mock(), 'org', 'user', 'password', 'sgid_table', 'agol_table')
+
+    assert session.organization is organization_mock.return_value
+    assert session.open_data_groups is organization_mock.return_value.get_open_data_groups.return_value
+    assert session.metatable is metatable_mock.return_value
+    session.refresh()
+    assert session.organization is organization_mock.return_value
+
+    organization_mock.assert_called_once_with(session.logger, 'org', 'user', 'password', http_options=None)
+    arcpy_mock.SignInToPortal.assert_called_once_with('org', 'user', 'password')
+    assert metatable_mock.return_value.read_metatable.call_count == 2
+
+
+def test_agol_session_refresh_renews_expired_session_and_lookups(mocker):
+    mocker.patch.dict('sys.modules', {'arcpy': mocker.Mock()})
+    organization_mock = mocker.patch('reporter.tools.Organization')
+    metatable_mock = mocker.patch('reporter.tools.Metatable')
+    monotonic_mock = mocker.patch('reporter.tools.monotonic')
+    monotonic_mock.return_value = 0
+
+    session = tools.AGOLSession(
+        mocker.Mock(), 'org', 'user', 'password', 'sgid_table', 'agol_table', max_session_minutes=90, cache_minutes=60
+    )
+    session.refresh()
+
+    monotonic_mock.return_value = 61 * 60
+    session.refresh()
+    assert organization_mock.call_count == 1
+    assert metatable_mock.call_count == 2
+
+    monotonic_mock.return_value = 91 * 60
+    session.refresh()
+    assert organization_mock.call_count == 2
+
+
+def test_progress_logger_rate_limits_and_logs_final_count(mocker):
+    monotonic_mock = mocker.patch('reporter.tools.monotonic')
+    monotonic_mock.return_value = 0
+    logger = mocker.Mock()
+
+    progress = tools.ProgressLogger(logger, 4, interval_seconds=10)
+    monotonic_mock.return_value = 5
+    progress.update()
+    progress.update()
+    assert logger.info.call_count == 0
+
+    monotonic_mock.return_value = 10
+    progress.update()
+    logger.info.assert_called_once_with('3/4 items, 0.3 items/s, ETA 3s')
+
+    monotonic_mock.return_value = 11
+    progress.update()
+    logger.info.assert_called_with('4/4 items, 0.4 items/s')
+
+
+def test_get_stale_item_info_uses_cached_sharing_and_usage(mocker, item):
+    org_mock = mocker.Mock()
+    get_usage_mock = mocker.patch('reporter.tools._get_usage')
+    get_sharing_mock = mocker.patch('reporter.tools._get_sharing')
+    cached_row = {
+        'sharing_everyone': 'False',
+        'sharing_org': 'True',
+        'sharing_groups': 'test_group',
+        'open_data_group': 'False',
+        'data_requests_1Y': 99,
+    }
+
+    test_row = tools.Organization.get_stale_item_info(org_mock, item, 'folder', 'SGID', cached_row)
+
+    assert test_row['stale'] == 'True'
+    assert test_row['title'] == 'title'
+    assert test_row['sizeMB'] == 12
+    assert test_row['sharing_groups'] == 'test_group'
+    assert test_row['data_requests_1Y'] == 99
+    get_usage_mock.assert_not_called()
+    get_sharing_mock.assert_not_called()
+
+
+def test_get_stale_item_info_without_cache(mocker, item):
+    org_mock = mocker.Mock()
+
+    test_row = tools.Organization.get_stale_item_info(org_mock, item, 'folder', 'SGID', None)
+
+    assert test_row['stale'] == 'True'
+    assert test_row['sharing_everyone'] is None
+    assert test_row['open_data_group'] is None
+    assert test_row['data_requests_1Y'] is None
@@ -0,0 +1,99 @@
+import http.server
+import threading
+
+import pytest
+
+requests = pytest.importorskip('requests')
+
+from reporter import transport  # pylint: disable=wrong-import-position
+
+
+def test_mount_routes_gis_session_through_adapter(mocker):
+    gis = mocker.Mock()
+    gis._con._session = requests.Session()
+    adapter = transport.TunedHTTPAdapter(pool_size=4)
+
+    assert transport.mount(gis, adapter)
+    assert gis._con._session.get_adapter('https://utah.maps.arcgis.com') is adapter
+
+
+def test_mount_without_requests_session(mocker):
+    gis = mocker.Mock(spec=['users'])
+
+    assert not transport.mount(gis, transport.TunedHTTPAdapter())
+
+
+def test_adapter_sets_default_timeout(mocker):
+    send_mock = mocker.patch('requests.adapters.HTTPAdapter.send')
+    adapter = transport.TunedHTTPAdapter(timeout=(1, 2))
+
+    adapter.send('request')
+    adapter.send('request', timeout=5)
+
+    assert send_mock.call_args_list[0][1]['timeout'] == (1, 2)
+    assert send_mock.call_args_list[1][1]['timeout'] == 5
+
+
+def test_get_shared_adapter_returns_same_adapter(mocker):
+    mocker.patch('reporter.transport._shared_adapter', None)
+
+    first = transport.get_shared_adapter(pool_size=3)
+    second = transport.get_shared_adapter(pool_size=20)
+
+    assert first is second
+    assert first._pool_maxsize == 3
+
+
+class _KeepAliveHandler(http.server.BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):  # pylint: disable=invalid-name
+        self.send_response(200)
+        self.send_header('Content-Length', '2')
+        self.end_headers()
+        self.wfile.write(b'ok')
+
+    def log_message(self, *args):  # pylint: disable=arguments-differ
+        pass
+
+
+@pytest.fixture
+def local_server():
+    server = http.server.ThreadingHTTPServer(('127.0.0.1', 0), _KeepAliveHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server.server_address[1]
+    server.shutdown()
+    server.server_close()
+
+
+def test_adapter_counts_requests_and_new_connections(local_server):
+    adapter = transport.TunedHTTPAdapter(pool_size=1)
+    session = requests.Session()
+    session.mount('http://', adapter)
+
+    for _ in range(3):
+        session.get(f'http://127.0.0.1:{local_server}/')
+
+    assert adapter.connection_stats() == (3, 1)
+
+
+def test_adapter_counts_survive_pool_eviction(local_server):
+    adapter = transport.TunedHTTPAdapter(pool_size=1)
+    session = requests.Session()
+    session.mount('http://', adapter)
+
+    #: Alternating hosts with room for only one pool evicts the other host's pool each time
+    for host in ('127.0.0.1', 'localhost', '127.0.0.1'):
+        session.get(f'http://{host}:{local_server}/')
+
+    assert adapter.connection_stats() == (3, 3)
+
+
+def test_format_stats_since_snapshot(mocker):
+    adapter = transport.TunedHTTPAdapter()
+    mocker.patch.object(adapter, 'connection_stats', return_value=(50, 5))
+
+    assert transport.format_stats(adapter) == 'HTTP: 50 requests over 5 new connections (90% reused)'
+    assert transport.format_stats(adapter, since=(10, 4)) == 'HTTP: 40 requests over 1 new connections (98% reused)'
+    assert transport.format_stats(adapter, since=(50, 5)) == 'HTTP: 0 requests over 0 new connections (0% reused)'